@@ -0,0 +1,41 @@
+"""
+Recall and per-query latency of the IVF approximate index against exact search.
+
+    uv run python benchmarks/bench_ann.py [--examples 200000] [--queries 500]
+
+For each nprobe setting, reports recall@k of IVFIndex versus FastKNNIndex on
+the same data, and p50/p99 latency in microseconds.
+"""
+import argparse
+import time
+import numpy as np
+
+from bench_knn import load_dataset, time_queries
+from trackpad_math.ann import IVFIndex
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--examples", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X, y = load_dataset(args.examples, rng)
+    queries = X[rng.integers(0, len(X), args.queries)] + rng.normal(0, 0.05, (args.queries, X.shape[1]))
+
+    start = time.perf_counter()
+    index = IVFIndex(n_neighbors=3).fit(X, y)
+    print(f"{args.examples} examples, {len(index.centroids)} lists, built in {time.perf_counter() - start:.1f}s")
+
+    exact = time_queries(lambda q: index.exact_kneighbors(q, args.k), queries)
+    print(f"{'search':<14}{'recall@' + str(args.k):>10}{'p50 us':>10}{'p99 us':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{np.percentile(exact, 50):>10.1f}{np.percentile(exact, 99):>10.1f}")
+    for nprobe in args.nprobe:
+        t = time_queries(lambda q: index.kneighbors(q, args.k, nprobe), queries)
+        recall = index.recall(queries, args.k, nprobe)
+        print(f"{'nprobe=' + str(nprobe):<14}{recall:>10.3f}{np.percentile(t, 50):>10.1f}{np.percentile(t, 99):>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-query latency of the kNN backends on seed-derived data.
+
+    uv run python benchmarks/bench_knn.py [--examples 20000] [--queries 2000]
+
+Compares sklearn's KNeighborsClassifier.predict_proba (the old "knn" path) with
+KNNIndex ("knn") and FastKNNIndex ("fastknn"), reporting p50/p99 in microseconds.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sklearn.neighbors import KNeighborsClassifier
+from trackpad_math.knn import FastKNNIndex, KNNIndex
+from trackpad_math.processing import extract_features_batch, pack_drawings
+
+SEED_FILE = os.path.join(os.path.dirname(__file__), "..", "src", "trackpad_math", "data", "seed_drawings.json")
+
+def load_dataset(num_examples: int, rng: np.random.Generator):
+    """Seed features, replicated with small jitter up to num_examples rows."""
+    with open(SEED_FILE, "r", encoding="utf-8") as f:
+        seed = json.load(f)
+    X = extract_features_batch(*pack_drawings([d["points"] for d in seed]))
+    labels = np.array([d["label"] for d in seed])
+    idx = rng.integers(0, len(X), num_examples)
+    return X[idx] + rng.normal(0, 0.01, (num_examples, X.shape[1])), list(labels[idx])
+
+def time_queries(fn, queries) -> np.ndarray:
+    fn(queries[0])  # warm up
+    times = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        fn(q)
+        times[i] = time.perf_counter() - start
+    return times * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--examples", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X, y = load_dataset(args.examples, rng)
+    queries = X[rng.integers(0, len(X), args.queries)] + rng.normal(0, 0.01, (args.queries, X.shape[1]))
+
+    sk = KNeighborsClassifier(n_neighbors=3).fit(X, y)
+    backends = {
+        "sklearn predict_proba": lambda q: sk.predict_proba(q.reshape(1, -1)),
+        "knn (KNNIndex)": KNNIndex(3).fit(X, y).rank,
+        "fastknn (FastKNNIndex)": FastKNNIndex(3).fit(X, y).rank,
+    }
+
+    print(f"{args.examples} examples x {X.shape[1]} features, {args.queries} queries")
+    print(f"{'backend':<26}{'p50 us':>10}{'p99 us':>10}")
+    for name, fn in backends.items():
+        t = time_queries(fn, queries)
+        print(f"{name:<26}{np.percentile(t, 50):>10.1f}{np.percentile(t, 99):>10.1f}")
+
+if __name__ == "__main__":
+    main()
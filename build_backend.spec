@@ -28,7 +28,7 @@ tmp_datas = []
 tmp_binaries = []
 
 # Define packages to collect.
-packages = ['sklearn', 'scipy', 'fastdtw', 'pynput', 'numpy']
+packages = ['sklearn', 'scipy', 'pynput', 'numpy']
 
 # Only try to collect Xlib if it's installed (Linux specific)
 import importlib.util
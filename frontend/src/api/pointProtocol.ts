@@ -0,0 +1,28 @@
+import type { Point } from '../types';
+
+// Binary /ws/record frames (see trackpad_math/protocol.py on the backend).
+// Header: u8 version, u8 action, u16 flags, u32 request id, u32 point count;
+// then per point f32 x, f32 y, u32 t. Everything little-endian.
+export const PROTOCOL_VERSION = 1;
+export const ACTION_CLASSIFY = 1;
+export const FLAG_BROADCAST = 1;
+
+const HEADER_SIZE = 12;
+const POINT_SIZE = 12;
+
+export function encodePointsFrame(action: number, requestId: number, points: Point[], flags = 0): ArrayBuffer {
+    const buffer = new ArrayBuffer(HEADER_SIZE + points.length * POINT_SIZE);
+    const view = new DataView(buffer);
+    view.setUint8(0, PROTOCOL_VERSION);
+    view.setUint8(1, action);
+    view.setUint16(2, flags, true);
+    view.setUint32(4, requestId, true);
+    view.setUint32(8, points.length, true);
+    points.forEach((p, i) => {
+        const offset = HEADER_SIZE + i * POINT_SIZE;
+        view.setFloat32(offset, p.x, true);
+        view.setFloat32(offset + 4, p.y, true);
+        view.setUint32(offset + 8, Math.max(0, Math.round(p.t)), true);
+    });
+    return buffer;
+}
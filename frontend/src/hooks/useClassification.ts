@@ -1,5 +1,6 @@
 import { useReducer, useEffect, useRef, useCallback } from 'react';
 import { getWsUrl } from '../api/config';
+import { ACTION_CLASSIFY, encodePointsFrame } from '../api/pointProtocol';
 import type { ClassificationState, Point } from '../types';
 
 type Action =
@@ -23,15 +24,31 @@ function reducer(state: ClassificationState, action: Action): ClassificationStat
 export function useClassification() {
     const [state, dispatch] = useReducer(reducer, { status: 'idle' });
     const ws = useRef<WebSocket | null>(null);
+    // Set once the backend accepts binary point frames; JSON is the fallback
+    const binary = useRef(false);
+    const lastRequestId = useRef(0);
 
     useEffect(() => {
         const wsUrl = getWsUrl('/ws/record');
         ws.current = new WebSocket(wsUrl);
 
+        ws.current.onopen = () => {
+            ws.current?.send(JSON.stringify({ action: 'hello', protocols: ['binary'] }));
+        };
+
         ws.current.onmessage = (event) => {
             try {
                 const data = JSON.parse(event.data);
-                if (['finished', 'error', 'idle'].includes(data.status)) {
+                if (data.status === 'hello') {
+                    binary.current = data.protocol === 'binary';
+                    return;
+                }
+                // A result for a drawing that has grown since is stale
+                if (data.request_id !== undefined && data.request_id !== lastRequestId.current) {
+                    return;
+                }
+                // busy ends the request like an error does, with a message
+                if (['finished', 'error', 'busy', 'idle'].includes(data.status)) {
                     dispatch({ type: 'UPDATE', payload: data });
                 }
             } catch (e) {
@@ -49,10 +66,16 @@ export function useClassification() {
 
         if (ws.current?.readyState === WebSocket.OPEN) {
             dispatch({ type: 'START_CLASSIFYING' });
-            ws.current.send(JSON.stringify({
-                action: 'classify',
-                points: points
-            }));
+            const requestId = ++lastRequestId.current;
+            if (binary.current) {
+                ws.current.send(encodePointsFrame(ACTION_CLASSIFY, requestId, points));
+            } else {
+                ws.current.send(JSON.stringify({
+                    action: 'classify',
+                    points: points,
+                    request_id: requestId
+                }));
+            }
         } else {
             console.warn('Classification WS not ready');
         }
@@ -84,6 +84,12 @@ export default function EditorPage() {
                     color: 'orange'
                 });
             }
+        } else if (classificationState.status === 'error' || classificationState.status === 'busy') {
+            notifications.show({
+                title: 'Error',
+                message: classificationState.message || 'Could not classify the drawing.',
+                color: 'red'
+            });
         }
     }, [classificationState, insertSymbol]);
 
@@ -4,7 +4,8 @@ export interface Point {
     t: number;
 }
 
-export type ClassificationStatus = 'idle' | 'classifying' | 'finished' | 'error';
+// 'busy': the backend's inference queue was full and the drawing wasn't classified
+export type ClassificationStatus = 'idle' | 'classifying' | 'finished' | 'error' | 'busy';
 
 export interface ClassificationCandidate {
     symbol: string;
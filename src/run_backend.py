@@ -89,14 +89,16 @@ async def run_server(app, host="127.0.0.1", port=0, dev_mode=False):
     logger.info("Main thread exited.")
 
 def main():
+    # PyInstaller freeze support for multiprocessing. Inference and retrain workers are
+    # started as this executable with --multiprocessing-fork arguments, so this has to
+    # run (and take over the process) before argparse sees them
+    multiprocessing.freeze_support()
+
     try:
         parser = argparse.ArgumentParser(description="Trackpad Math Backend")
         parser.add_argument("--dev", action="store_true", help="Run in development mode")
         args = parser.parse_args()
 
-        # PyInstaller freeze support for multiprocessing
-        multiprocessing.freeze_support()
-
         # Initialize config first to set up environment variables and logging
         config.init_config()
 
@@ -0,0 +1,176 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from trackpad_math.knn import FastKNNIndex
+
+def kmeans(X: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means with k-means++ seeding. Returns (k, F) float32 centroids."""
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=np.float32)
+    norms = np.einsum("ij,ij->i", X, X)
+
+    # k-means++ seeding
+    centroids = np.empty((k, X.shape[1]), dtype=np.float32)
+    centroids[0] = X[rng.integers(len(X))]
+    closest = np.maximum(norms - 2 * X @ centroids[0] + centroids[0] @ centroids[0], 0)
+    for i in range(1, k):
+        total = closest.sum()
+        idx = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centroids[i] = X[idx]
+        closest = np.minimum(closest, np.maximum(norms - 2 * X @ centroids[i] + centroids[i] @ centroids[i], 0))
+
+    for _ in range(iterations):
+        assign = nearest_centroid(X, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, X)
+        filled = counts > 0
+        # Empty clusters keep their previous centroid
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+def nearest_centroid(X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    c_norms = np.einsum("ij,ij->i", centroids, centroids)
+    return np.argmin(c_norms[None, :] - 2 * X @ centroids.T, axis=1)
+
+class IVFIndex(FastKNNIndex):
+    """
+    Approximate nearest-neighbour index over feature vectors (inverted file).
+
+    A k-means coarse quantizer splits the stored rows into nlist cells; a query only
+    scans the rows of the nprobe cells whose centroids are closest to it. nprobe is
+    the recall/latency knob: nprobe == nlist is exact search.
+
+    Rows added after the quantizer was built are assigned to their nearest cell
+    and kept in an unindexed tail until the index has doubled, at which point the
+    quantizer is retrained. Small indexes (< min_train_size) are searched exactly.
+    """
+
+    # Quantizer rebuilds rewrite the cell assignment of every row
+    appendable = False
+
+    def __init__(self, n_neighbors: int = 3, nprobe: int = 8, nlist: Optional[int] = None,
+                 min_train_size: int = 2048):
+        super().__init__(n_neighbors)
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.min_train_size = min_train_size
+        self.centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int64)
+        # Inverted lists over rows [0, _trained): row ids grouped by cell, CSR style
+        self._list_rows = np.zeros(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+        self._trained = 0
+
+    def fit(self, X: np.ndarray, labels: Sequence[str]) -> "IVFIndex":
+        super().fit(X, labels)
+        self._build()
+        return self
+
+    def add(self, x: np.ndarray, label: str):
+        super().add(x, label)
+        if self.centroids is None:
+            if self._n >= self.min_train_size:
+                self._build()
+            return
+        if self._n >= 2 * self._trained:
+            self._build()
+        else:
+            self._assign[self._n - 1] = nearest_centroid(self.X[self._n - 1:], self.centroids)[0]
+
+    def _grown(self, capacity: int):
+        super()._grown(capacity)
+        assign = np.zeros(capacity, dtype=np.int64)
+        assign[:self._n] = self._assign[:self._n]
+        self._assign = assign
+
+    def _build(self):
+        """(Re)trains the coarse quantizer and the inverted lists on all stored rows."""
+        if self._n < self.min_train_size:
+            self.centroids = None
+            self._trained = 0
+            return
+        nlist = self.nlist or int(np.clip(np.sqrt(self._n), 1, 4096))
+        # Train on a bounded sample; assignment still covers every row
+        rng = np.random.default_rng(0)
+        sample = self.X
+        if self._n > 64 * nlist:
+            sample = self.X[rng.choice(self._n, 64 * nlist, replace=False)]
+        self.centroids = kmeans(sample, nlist)
+
+        assign = nearest_centroid(self.X, self.centroids)
+        # A fresh array: older forks of this index (see with_example) keep their assignment
+        self._assign = np.zeros(len(self._X), dtype=np.int64)
+        self._assign[:self._n] = assign
+        self._list_rows = np.argsort(assign, kind="stable")
+        self._list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=self._list_offsets[1:])
+        self._trained = self._n
+
+    def _candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        c_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        c_d2 = c_norms - 2 * self.centroids @ q
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(c_d2, nprobe - 1)[:nprobe]
+        rows = [self._list_rows[self._list_offsets[c]:self._list_offsets[c + 1]] for c in probe]
+        # Rows inserted since the last build
+        tail = np.arange(self._trained, self._n)
+        rows.append(tail[np.isin(self._assign[self._trained:self._n], probe)])
+        return np.concatenate(rows)
+
+    def kneighbors(self, x: np.ndarray, k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self.centroids is None:
+            return super().kneighbors(x, k)
+        q = np.asarray(x, dtype=np.float32).ravel()
+        cand = self._candidates(q, nprobe or self.nprobe)
+        k = min(k, len(cand))
+        if k == 0:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        d2 = self._norms[cand] - 2 * (self._X[cand] @ q) + q @ q
+        np.maximum(d2, 0.0, out=d2)
+        part = np.argpartition(d2, k - 1)[:k] if k < len(cand) else np.arange(len(cand))
+        part = part[np.argsort(d2[part], kind="stable")]
+        return np.sqrt(d2[part]), cand[part]
+
+    def rank_batch(self, X: np.ndarray) -> List[List[Tuple[str, float]]]:
+        # Each query probes its own lists, so there is no shared distance matrix to batch
+        if self.centroids is None:
+            return super().rank_batch(X)
+        return [self.rank(x) for x in X]
+
+    def exact_kneighbors(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return super().kneighbors(x, k)
+
+    def recall(self, queries: np.ndarray, k: int = 10, nprobe: Optional[int] = None) -> float:
+        """Mean fraction of the exact k nearest neighbours that the approximate search returns."""
+        hits = 0
+        total = 0
+        for q in np.atleast_2d(queries):
+            _, approx = self.kneighbors(q, k, nprobe)
+            _, exact = self.exact_kneighbors(q, k)
+            hits += len(np.intersect1d(approx, exact))
+            total += len(exact)
+        return hits / max(total, 1)
+
+    def to_artifact(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        arrays, meta = super().to_artifact()
+        arrays.update(assign=self._assign[:self._n], list_rows=self._list_rows, list_offsets=self._list_offsets)
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+        meta.update(nprobe=self.nprobe, nlist=self.nlist, min_train_size=self.min_train_size, trained=self._trained)
+        return arrays, meta
+
+    @classmethod
+    def from_artifact(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "IVFIndex":
+        index = super().from_artifact(arrays, meta)
+        index.nprobe, index.nlist, index.min_train_size = meta["nprobe"], meta["nlist"], meta["min_train_size"]
+        index._assign = arrays["assign"]
+        index._list_rows, index._list_offsets = arrays["list_rows"], arrays["list_offsets"]
+        index.centroids = arrays.get("centroids")
+        index._trained = meta["trained"]
+        return index
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["_assign"] = self._assign[:self._n].copy()
+        return state
@@ -2,10 +2,15 @@ import os
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from trackpad_math.cursor import CursorController
 from trackpad_math.db import Database
 from trackpad_math.routers import websocket, data, settings
 from trackpad_math.socket_manager import ConnectionManager
 from trackpad_math.model import SymbolClassifier
+from trackpad_math.retrain import RetrainManager
+from trackpad_math.importer import ImportManager
+from trackpad_math.inference import InferencePool
+from trackpad_math.label_counts import reconcile_label_counts
 from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 
@@ -23,23 +28,50 @@ async def lifespan(app: FastAPI):
         if not app_data_dir:
             raise RuntimeError("APP_DATA_DIR environment variable not set. Did you call init_config()?")
         base_model_path = os.path.join(app_data_dir, "model")
-        app.state.classifier = SymbolClassifier(model_type="knn", base_path=base_model_path)
+        model_type = os.environ.get("MODEL_TYPE", "knn")
+        cascade_shortlist = int(os.environ.get("CASCADE_SHORTLIST", "5"))
+        app.state.classifier = SymbolClassifier(
+            model_type=model_type, base_path=base_model_path, cascade_shortlist=cascade_shortlist
+        )
         if not app.state.classifier.load():
             logger.debug("Model not found. Training model.")
             db.seed_if_empty()
             with db.session_scope() as session:
                 if not data.train_model_from_db(session, app.state.classifier):
                     logger.error("Failed to train model.")
+        # Repairs per-label counts of drawings written without them (seeding, older versions)
+        with db.session_scope() as session:
+            reconcile_label_counts(session)
         app.state.classifier.warmup()
+        # Later retrains run in a worker process and stage their model next to the live one
+        app.state.retrainer = RetrainManager(app.state.classifier, os.path.join(app_data_dir, "model_staging"))
+        app.state.importer = ImportManager()
+        # Classification runs in worker processes that memory-map the saved model
+        app.state.inference = InferencePool(
+            app.state.classifier,
+            workers=int(os.environ.get("INFERENCE_WORKERS", "1")),
+            queue_size=int(os.environ.get("INFERENCE_QUEUE_SIZE", "32")),
+            overload=os.environ.get("INFERENCE_OVERLOAD", "degrade"),
+            batch_window_ms=float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", "2")),
+            batch_size=int(os.environ.get("INFERENCE_BATCH_SIZE", "16")),
+        )
 
-        app.state.socket_manager = ConnectionManager()
+        app.state.socket_manager = ConnectionManager(
+            queue_size=int(os.environ.get("WS_SEND_QUEUE_SIZE", "32")),
+            slow_consumer=os.environ.get("WS_SLOW_CONSUMER", "drop_oldest"),
+        )
+        # set_cursor moves go through one worker thread that keeps the mouse controller
+        app.state.cursor = CursorController()
     except Exception as e:
         logger.error(f"Error in startup: {e}")
         raise e
 
     yield
     
-    # Shutdown logic goes here if needed
+    app.state.retrainer.shutdown()
+    app.state.inference.shutdown()
+    app.state.socket_manager.shutdown()
+    app.state.cursor.shutdown()
 
 app = FastAPI(title="Trackpad Math", lifespan=lifespan)
 
@@ -57,6 +89,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor of /api/drawings
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include Routers
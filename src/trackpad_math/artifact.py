@@ -0,0 +1,191 @@
+"""
+A model artifact is a directory:
+
+    header.json                format/model/pipeline versions, model metadata, and for
+                               every array its file, dtype, shape and crc32
+    <name>-<version>-<id>.npy  one plain .npy file per array, loadable with mmap_mode
+
+header.json is the commit point: it is written to a temp file and os.replace'd over
+the old one, after the arrays it references are on disk. A full write puts the arrays
+in new files and then removes the ones the old header referenced. append_rows grows
+append-only arrays in place instead: new rows go after the committed ones and only
+the header is rewritten, so a crash before the commit leaves ignored trailing rows.
+"""
+
+import json
+import os
+import struct
+import uuid
+import zlib
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+# Bump when the directory layout or header schema changes incompatibly
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+# Fixed .npy header size, so an appended array can rewrite its shape in place
+NPY_HEADER_SIZE = 128
+
+Arrays = Dict[str, np.ndarray]
+
+def _npy_header(dtype: np.dtype, shape: Tuple[int, ...]) -> bytes:
+    """Version 1.0 .npy header, space-padded to NPY_HEADER_SIZE bytes."""
+    d = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(int(s) for s in shape)
+    )
+    size = NPY_HEADER_SIZE - 10
+    if len(d) >= size:
+        raise ValueError(f"Array shape {shape} does not fit in the .npy header")
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", size) + (d.ljust(size - 1) + "\n").encode("latin1")
+
+def _raw(arr: np.ndarray) -> np.ndarray:
+    """The array's bytes as a flat uint8 view (no copy if already contiguous)."""
+    return np.ascontiguousarray(arr).reshape(-1).view(np.uint8)
+
+def _crc32(arr: np.ndarray, crc: int = 0) -> int:
+    return zlib.crc32(_raw(arr), crc)
+
+def _write_json(path: str, header: Dict[str, Any]):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def read_header(path: str) -> Optional[Dict[str, Any]]:
+    """The artifact's header, or None if there is no artifact at path."""
+    header_path = os.path.join(path, HEADER_FILE)
+    if not os.path.exists(header_path):
+        return None
+    with open(header_path, encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format {header.get('format_version')}")
+    return header
+
+def write_artifact(path: str, model_type: str, model_version: int, pipeline_version: str,
+                   arrays: Arrays, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Writes a complete artifact, replacing any previous one at path. Returns the header."""
+    os.makedirs(path, exist_ok=True)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_type": model_type,
+        "model_version": model_version,
+        "pipeline_version": pipeline_version,
+        "meta": meta,
+        "arrays": {},
+    }
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        # Never reuse a name: an older file may still be memory-mapped by a live model
+        file_name = f"{name}-{model_version}-{uuid.uuid4().hex[:8]}.npy"
+        with open(os.path.join(path, file_name), "wb") as f:
+            f.write(_npy_header(arr.dtype, arr.shape))
+            f.write(_raw(arr))
+            f.flush()
+            os.fsync(f.fileno())
+        header["arrays"][name] = {
+            "file": file_name,
+            "dtype": np.lib.format.dtype_to_descr(arr.dtype),
+            "shape": list(arr.shape),
+            "crc32": _crc32(arr),
+        }
+    _write_json(os.path.join(path, HEADER_FILE), header)
+
+    # Files the new header doesn't reference belong to older versions
+    keep = {HEADER_FILE} | {a["file"] for a in header["arrays"].values()}
+    for file_name in os.listdir(path):
+        if file_name not in keep:
+            try:
+                os.remove(os.path.join(path, file_name))
+            except OSError:
+                # Still memory-mapped (Windows); removed by a later write
+                pass
+    return header
+
+def append_rows(path: str, model_version: int, arrays: Arrays, meta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Updates an artifact whose arrays have only grown along axis 0 since it was written:
+    writes just the new rows of each array and commits a new header. arrays must hold
+    the full current arrays (the committed rows are assumed unchanged).
+
+    Returns the new header, or None if the saved layout doesn't allow an append (no
+    artifact, different array set, or a changed dtype or row shape); the caller then
+    needs write_artifact.
+    """
+    header = read_header(path)
+    if header is None or set(header["arrays"]) != set(arrays):
+        return None
+    for name, arr in arrays.items():
+        saved = header["arrays"][name]
+        if (np.lib.format.dtype_to_descr(arr.dtype) != saved["dtype"]
+                or list(arr.shape[1:]) != saved["shape"][1:] or arr.shape[0] < saved["shape"][0]):
+            return None
+
+    for name, arr in arrays.items():
+        saved = header["arrays"][name]
+        rows = saved["shape"][0]
+        if arr.shape[0] == rows:
+            continue
+        tail = np.ascontiguousarray(arr[rows:])
+        row_bytes = tail.nbytes // len(tail)
+        with open(os.path.join(path, saved["file"]), "r+b") as f:
+            # Overwrites any rows left over from an append that never committed
+            f.seek(NPY_HEADER_SIZE + rows * row_bytes)
+            f.write(_raw(tail))
+            f.seek(0)
+            f.write(_npy_header(arr.dtype, arr.shape))
+            f.flush()
+            os.fsync(f.fileno())
+        saved["shape"] = list(arr.shape)
+        saved["crc32"] = _crc32(tail, saved["crc32"])
+
+    header["model_version"] = model_version
+    header["meta"] = meta
+    _write_json(os.path.join(path, HEADER_FILE), header)
+    return header
+
+def read_artifact(path: str, mmap_mode: Optional[str] = "r", verify: bool = True,
+                  verified: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Arrays]:
+    """
+    Opens every array of the artifact at path (memory-mapped by default). Raises
+    ValueError if an array file is missing, truncated or fails its checksum.
+
+    verified is the "arrays" entry of a header this process already read or wrote:
+    an array still in the same file is only checksummed past the rows verified then,
+    so reloading after an append doesn't read the whole artifact back.
+    """
+    header = read_header(path)
+    if header is None:
+        raise FileNotFoundError(f"No model artifact at {path}")
+    arrays = {}
+    for name, saved in header["arrays"].items():
+        file_path = os.path.join(path, saved["file"])
+        try:
+            arr = np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Model artifact array {name!r} is unreadable: {e}") from e
+        shape = tuple(saved["shape"])
+        if arr.dtype != np.dtype(saved["dtype"]) or arr.shape[1:] != shape[1:] or arr.shape[0] < shape[0]:
+            raise ValueError(f"Model artifact array {name!r} has shape {arr.shape}, expected {shape}")
+        # Rows past the committed shape come from an interrupted append
+        arr = arr[:shape[0]]
+        if verify:
+            known = (verified or {}).get(name)
+            if known is not None and known["file"] == saved["file"] and known["shape"][0] <= shape[0]:
+                # Appends never touch committed rows; continue the known checksum over the new ones
+                crc = _crc32(arr[known["shape"][0]:], known["crc32"])
+            else:
+                crc = _crc32(arr)
+            if crc != saved["crc32"]:
+                raise ValueError(f"Model artifact array {name!r} failed its checksum")
+        arrays[name] = arr
+    return header, arrays
+
+def remove_artifact(path: str):
+    if not os.path.isdir(path):
+        return
+    for file_name in os.listdir(path):
+        os.remove(os.path.join(path, file_name))
+    os.rmdir(path)
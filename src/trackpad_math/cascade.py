@@ -0,0 +1,92 @@
+import copy
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+
+from trackpad_math.dtw import DTWIndex
+from trackpad_math.knn import FastKNNIndex
+
+class CascadeIndex:
+    """
+    Two-stage classifier: a fast KNN over extract_features vectors shortlists the
+    shortlist_size most likely labels, then DTW re-ranks using only the templates of
+    those labels. Row i of the KNN index and template i of the DTW index are the
+    same example.
+    """
+
+    appendable = True
+
+    def __init__(self, shortlist_size: int = 5):
+        self.shortlist_size = shortlist_size
+        self.knn = FastKNNIndex(n_neighbors=3)
+        self.dtw = DTWIndex()
+
+    def __len__(self) -> int:
+        return len(self.knn)
+
+    def fit(self, features: np.ndarray, templates: np.ndarray, template_offsets: np.ndarray,
+            labels: Sequence[str]) -> "CascadeIndex":
+        self.knn.fit(features, labels)
+        self.dtw = DTWIndex.from_ragged(templates, template_offsets, labels)
+        return self
+
+    def add(self, features: np.ndarray, template: np.ndarray, label: str):
+        self.knn.add(features, label)
+        self.dtw.add(template, label)
+
+    def with_example(self, features: np.ndarray, template: np.ndarray, label: str) -> "CascadeIndex":
+        """Copy-on-write add(); see KNNIndex.with_example."""
+        index = copy.copy(self)
+        index.knn = self.knn.with_example(features, label)
+        index.dtw = self.dtw.with_example(template, label)
+        return index
+
+    def to_artifact(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        knn_arrays, knn_meta = self.knn.to_artifact()
+        dtw_arrays, dtw_meta = self.dtw.to_artifact()
+        arrays = {f"knn.{k}": v for k, v in knn_arrays.items()}
+        arrays.update({f"dtw.{k}": v for k, v in dtw_arrays.items()})
+        return arrays, {"shortlist_size": self.shortlist_size, "knn": knn_meta, "dtw": dtw_meta}
+
+    @classmethod
+    def from_artifact(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "CascadeIndex":
+        index = cls(shortlist_size=meta["shortlist_size"])
+        index.knn = FastKNNIndex.from_artifact(
+            {k[4:]: v for k, v in arrays.items() if k.startswith("knn.")}, meta["knn"])
+        index.dtw = DTWIndex.from_artifact(
+            {k[4:]: v for k, v in arrays.items() if k.startswith("dtw.")}, meta["dtw"])
+        return index
+
+    def shortlist(self, features: np.ndarray) -> np.ndarray:
+        """Label ids (into knn.classes) of the closest distinct labels, closest first."""
+        n = len(self.knn)
+        k = min(max(3 * self.shortlist_size, 10), n)
+        while True:
+            _, idx = self.knn.kneighbors(features, k)
+            # Distinct labels in neighbour order
+            ids = self.knn.y[idx]
+            _, first = np.unique(ids, return_index=True)
+            ids = ids[np.sort(first)]
+            if len(ids) >= self.shortlist_size or k >= n:
+                return ids[:self.shortlist_size]
+            k = min(k * 4, n)
+
+    def query(self, features: np.ndarray, sequence: np.ndarray,
+              k: int = 5) -> Tuple[List[Tuple[str, float]], Dict[str, float]]:
+        """Up to k (label, DTW distance) pairs, closest first, and the per-stage wall time (ms)."""
+        if len(self.knn) == 0:
+            return [], {}
+
+        start = time.perf_counter()
+        shortlist = self.shortlist(features)
+        mid = time.perf_counter()
+        mask = np.isin(self.knn.y, shortlist)
+        matches, _ = self.dtw.query(sequence, k=k, mask=mask)
+        end = time.perf_counter()
+
+        timings = {
+            "shortlist_ms": (mid - start) * 1000,
+            "dtw_ms": (end - mid) * 1000,
+            "dtw_templates": int(mask.sum()),
+        }
+        return matches, timings
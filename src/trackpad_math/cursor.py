@@ -0,0 +1,95 @@
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+class PynputBackend:
+    """Moves the system cursor with one pynput mouse controller."""
+
+    def __init__(self):
+        from pynput import mouse
+        self._controller = mouse.Controller()
+
+    def move(self, x: int, y: int):
+        self._controller.position = (x, y)
+
+class CursorController:
+    """
+    Moves the cursor from one long-lived worker thread, so the backend (by default a
+    pynput controller) is created once rather than on every set_cursor message.
+
+    Moves are coalesced: the worker keeps a single slot with the latest requested
+    position, so a burst of requests arriving while it is busy is applied as one
+    move. Every request's future resolves once a position at least as new as its own
+    was applied, with True, or False if the cursor couldn't be moved. Failures are
+    logged once until a move succeeds again.
+
+    backend_factory is called on the worker thread and must return an object with a
+    move(x, y) method; tests pass a fake one to run headless.
+    """
+
+    def __init__(self, backend_factory: Callable[[], Any] = PynputBackend):
+        self.backend_factory = backend_factory
+        self.logger = logging.getLogger("app")
+        self._cond = threading.Condition()
+        self._position: Optional[Tuple[int, int]] = None
+        self._waiters: List[Future] = []
+        self._stopped = False
+        self._failing = False
+        self.moves = 0
+        self.coalesced = 0
+        self._thread = threading.Thread(target=self._run, name="cursor", daemon=True)
+        self._thread.start()
+
+    def move(self, x: int, y: int) -> Future:
+        """Requests a move to (x, y). Returns a future resolved when it was applied."""
+        future: Future = Future()
+        with self._cond:
+            if self._stopped:
+                future.set_result(False)
+                return future
+            if self._position is not None:
+                self.coalesced += 1
+            self._position = (x, y)
+            self._waiters.append(future)
+            self._cond.notify()
+        return future
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        backend = None
+        try:
+            backend = self.backend_factory()
+        except Exception as e:
+            self._report(f"Could not set up cursor control: {e}")
+
+        while True:
+            with self._cond:
+                while self._position is None and not self._stopped:
+                    self._cond.wait()
+                if self._position is None:
+                    return
+                position, waiters = self._position, self._waiters
+                self._position, self._waiters = None, []
+
+            moved = False
+            if backend is not None:
+                try:
+                    backend.move(*position)
+                    moved = True
+                    self.moves += 1
+                    self._failing = False
+                except Exception as e:
+                    self._report(f"Could not reset cursor: {e}")
+            for future in waiters:
+                future.set_result(moved)
+
+    def _report(self, message: str):
+        if not self._failing:
+            self._failing = True
+            self.logger.warning(message)
@@ -3,23 +3,105 @@ import os
 import json
 import uuid
 import datetime
-from typing import List, Dict, Any, Optional
+import struct
+from typing import Any, Optional
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine, Column, String, DateTime, func, Integer, Uuid, JSON, Boolean
+import numpy as np
+from sqlalchemy import create_engine, Column, String, DateTime, func, Index, Integer, Uuid, Boolean, LargeBinary
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+from sqlalchemy.types import TypeDecorator
+
+from trackpad_math.processing import PointsLike, points_to_array
+
+# Packed points: a header (u1 format version, u4 point count, f8 t of the first
+# point), then N float32 x, N float32 y and N float32 t deltas, little-endian
+POINTS_FORMAT_VERSION = 1
+POINTS_HEADER = struct.Struct("<BId")
+
+def encode_points(points: PointsLike) -> bytes:
+    """Packs a drawing's points for storage; the inverse of decode_points."""
+    arr = points_to_array(points)
+    t0 = float(arr[0, 2]) if len(arr) else 0.0
+    dt = np.diff(arr[:, 2], prepend=t0)
+    return (
+        POINTS_HEADER.pack(POINTS_FORMAT_VERSION, len(arr), t0)
+        + arr[:, 0].astype("<f4").tobytes() + arr[:, 1].astype("<f4").tobytes() + dt.astype("<f4").tobytes()
+    )
+
+def decode_points(blob: bytes) -> np.ndarray:
+    """Unpacks stored points to an (N, 3) float64 x, y, t array."""
+    version, count, t0 = POINTS_HEADER.unpack_from(blob)
+    if version != POINTS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported points format version {version}")
+    columns = np.frombuffer(blob, dtype="<f4", count=3 * count, offset=POINTS_HEADER.size).reshape(3, count)
+    arr = np.empty((count, 3), dtype=np.float64)
+    arr[:, 0], arr[:, 1] = columns[0], columns[1]
+    np.cumsum(columns[2], out=arr[:, 2])
+    arr[:, 2] += t0
+    return arr
+
+class PointsBlob(TypeDecorator):
+    """Stores points (a {x, y, t} list or an (N, 3) array) packed; loads them as an (N, 3) array."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else encode_points(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decode_points(value)
+
+# SQLite keeps datetimes as text and compares them as strings. Rows get their timestamp
+# from CURRENT_TIMESTAMP, which has no fractional seconds, so bound values must not
+# have them either for range filters (export, pagination) to compare correctly.
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
 
 class Base(DeclarativeBase):
     pass
 
 class Drawing(Base):
     __tablename__ = "drawings"
+    __table_args__ = (
+        # Newest-first pages, by label or overall, read straight off these in (timestamp, id)
+        # order (see routers.data.get_drawings); the first also serves plain label lookups
+        Index("ix_drawings_label_timestamp", "label", "timestamp", "id"),
+        Index("ix_drawings_timestamp", "timestamp", "id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    label: Mapped[str] = mapped_column(String, index=True)
-    timestamp: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
-    # points is a flat list of points. Each point is {x, y, t}
-    points: Mapped[List[Dict[str, float]]] = mapped_column(JSON)
+    label: Mapped[str] = mapped_column(String)
+    timestamp: Mapped[datetime.datetime] = mapped_column(Timestamp, server_default=func.now())
+    # Flat list of points: accepts {x, y, t} dicts or an (N, 3) array, loads as the
+    # array. processing.array_to_points gives the dict form for API responses.
+    points: Mapped[np.ndarray] = mapped_column(PointsBlob)
+
+class DrawingFeatures(Base):
+    """Cached pipeline output for a Drawing, so retraining doesn't re-derive it from points."""
+    __tablename__ = "drawing_features"
+
+    drawing_id: Mapped[uuid.UUID] = mapped_column(Uuid(as_uuid=True), primary_key=True)
+    # processing.PIPELINE_VERSION the entry was computed with; mismatches are recomputed
+    pipeline_version: Mapped[str] = mapped_column(String)
+    # float64 feature vector (processing.NUM_FEATURES,)
+    features: Mapped[bytes] = mapped_column(LargeBinary)
+    # float64 DTW template, (L, 2) flattened
+    template: Mapped[bytes] = mapped_column(LargeBinary)
+
+class LabelCount(Base):
+    """Number of drawings per label, kept up to date by writers (see trackpad_math.label_counts)."""
+    __tablename__ = "label_counts"
+    label: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+class SchemaVersion(Base):
+    """Last migration applied to the database (see trackpad_math.migrations)."""
+    __tablename__ = "schema_version"
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
 
 class DBSetting(Base):
     __tablename__ = "settings"
@@ -64,9 +146,10 @@ class Database:
             session.close()
 
     def init_db(self):
-        """Creates tables if they don't exist."""
+        """Creates tables if they don't exist and migrates an older database."""
+        from trackpad_math.migrations import migrate
         self.connect()
-        Base.metadata.create_all(bind=self.engine)
+        migrate(self.engine)
 
     def seed_if_empty(self):
         """Seeds the database with default settings and symbols if it's empty."""
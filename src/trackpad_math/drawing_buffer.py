@@ -0,0 +1,99 @@
+import threading
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+from trackpad_math.processing import (
+    PreparedDrawing, features_from_resampled, resample_strokes_array, segment_strokes_array
+)
+
+class DrawingBuffer:
+    """
+    The in-progress drawing of one /ws/record connection, as (N, 3) x, y, t rows in
+    a buffer that grows by doubling, so appending a few points is amortized O(1)
+    however long the drawing gets.
+
+    prepare() runs the processing pipeline incrementally: each stroke's resampled
+    points and bounds are cached under its (start, end) rows, so a stroke is only
+    processed once it stops changing, and classifying the drawing again after more
+    points arrive only redoes the stroke(s) those points touched. Segmentation itself
+    depends on the median time gap of the whole drawing, so it is redone every time;
+    strokes it splits differently simply miss the cache.
+
+    prepare() can run in another thread (the websocket handler uses the threadpool)
+    while append() and clear() keep going: it works on a copy of the rows it was
+    asked for, and never mutates a stroke cache another call may be reading.
+    """
+
+    def __init__(self, max_points: int = 100_000):
+        self.max_points = max_points
+        self._points = np.zeros((0, 3), dtype=np.float64)
+        self._n = 0
+        # (start, end) row range -> (resampled stroke (1, n, 3), xy mins, xy maxs)
+        self._strokes: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        # Bumped by clear(), so a prepare() of the previous drawing doesn't fill the cache
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def points(self) -> np.ndarray:
+        """View of the buffered points; only valid until the next append or clear."""
+        return self._points[:self._n]
+
+    def append(self, points: np.ndarray):
+        """Appends (M, 3) points. Raises ValueError past max_points."""
+        with self._lock:
+            count = self._n + len(points)
+            if count > self.max_points:
+                raise ValueError(f"Drawing would exceed {self.max_points} points")
+            if count > len(self._points):
+                grown = np.zeros((max(count, 2 * len(self._points), 256), 3), dtype=np.float64)
+                grown[:self._n] = self._points[:self._n]
+                self._points = grown
+            self._points[self._n:count] = points
+            self._n = count
+
+    def prepare(self, upto: Optional[int] = None) -> PreparedDrawing:
+        """Features and DTW sequence of the first upto points (default: all of them)."""
+        with self._lock:
+            n = self._n if upto is None else min(upto, self._n)
+            points = self._points[:n].copy()
+            cache, generation = self._strokes, self._generation
+        offsets = segment_strokes_array(points)
+        current = {}
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+            stroke = cache.get((start, end))
+            if stroke is None:
+                rows = points[start:end]
+                stroke = (
+                    resample_strokes_array(rows, np.array([0, end - start], dtype=np.int64)),
+                    rows[:, :2].min(axis=0), rows[:, :2].max(axis=0),
+                )
+            current[(start, end)] = stroke
+        with self._lock:
+            if generation == self._generation:
+                if n == self._n:
+                    # Ranges that are no longer strokes of the drawing won't be asked for again
+                    self._strokes = current
+                else:
+                    self._strokes = {**self._strokes, **current}
+        strokes = list(current.values())
+
+        if not strokes:
+            features, sequence = features_from_resampled(np.zeros((0, 1, 3)), np.zeros(2), np.zeros(2))
+        else:
+            features, sequence = features_from_resampled(
+                np.concatenate([r for r, _, _ in strokes]),
+                np.min([lo for _, lo, _ in strokes], axis=0),
+                np.max([hi for _, _, hi in strokes], axis=0),
+            )
+        return PreparedDrawing(features, sequence, len(points))
+
+    def clear(self):
+        # Keeps the allocation for the next drawing
+        with self._lock:
+            self._n = 0
+            self._strokes = {}
+            self._generation += 1
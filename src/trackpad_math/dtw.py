@@ -0,0 +1,211 @@
+import copy
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Templates compared per vectorized DTW batch
+CHUNK_SIZE = 32
+
+def _pair_costs(query: np.ndarray, templates: np.ndarray) -> np.ndarray:
+    """Euclidean point distances between a (Lq, 2) query and (C, L, 2) templates -> (C, Lq, L)."""
+    dx = query[None, :, None, 0] - templates[:, None, :, 0]
+    dy = query[None, :, None, 1] - templates[:, None, :, 1]
+    return np.sqrt(dx * dx + dy * dy)
+
+def dtw_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Exact DTW distance between two (L, 2) sequences (reference implementation)."""
+    cost = _pair_costs(a, b[None])[0]
+    D = np.full((len(a) + 1, len(b) + 1), np.inf)
+    D[0, 0] = 0.0
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            D[i, j] = cost[i - 1, j - 1] + min(D[i - 1, j], D[i, j - 1], D[i - 1, j - 1])
+    return float(D[-1, -1])
+
+class DTWIndex:
+    """
+    DTW templates kept in one padded contiguous (T, L, 2) array with their lengths and labels.
+
+    query() returns the k closest distinct labels by exact DTW (euclidean point cost,
+    unconstrained warping). Candidates are visited in order of their LB_Kim bound and
+    skipped once the bound can't beat the current k-th best label; survivors get a
+    tighter row-minimum bound and then a batched DTW that abandons a template as soon
+    as a whole row of its cost matrix exceeds the k-th best.
+    """
+
+    # Templates are only ever appended, so a saved artifact can grow in place
+    appendable = True
+
+    def __init__(self):
+        self._buf = np.zeros((0, 0, 2), dtype=np.float64)
+        self._lengths = np.zeros(0, dtype=np.int64)
+        self._n = 0
+        self.labels: List[str] = []
+
+    @classmethod
+    def from_ragged(cls, templates: np.ndarray, offsets: np.ndarray, labels: Sequence[str]) -> "DTWIndex":
+        index = cls()
+        lengths = np.diff(offsets).astype(np.int64)
+        n = len(lengths)
+        index._reserve(n, int(lengths.max()) if n else 0)
+        rows = np.repeat(np.arange(n), lengths)
+        cols = np.arange(len(templates)) - np.repeat(offsets[:-1], lengths)
+        index._buf[rows, cols] = templates
+        index._lengths[:n] = lengths
+        index._n = n
+        index.labels = list(labels)
+        return index
+
+    @classmethod
+    def from_templates(cls, templates: Sequence[np.ndarray], labels: Sequence[str]) -> "DTWIndex":
+        offsets = np.zeros(len(templates) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in templates], out=offsets[1:])
+        flat = np.concatenate(templates) if len(templates) else np.zeros((0, 2))
+        return cls.from_ragged(flat, offsets, labels)
+
+    def to_artifact(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Arrays and JSON metadata for artifact.write_artifact; labels are stored as ids."""
+        class_ids: Dict[str, int] = {}
+        y = np.array([class_ids.setdefault(label, len(class_ids)) for label in self.labels], dtype=np.int64)
+        arrays = {"templates": self.templates, "lengths": self.lengths, "y": y}
+        return arrays, {"classes": list(class_ids)}
+
+    @classmethod
+    def from_artifact(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "DTWIndex":
+        """Wraps (possibly memory-mapped) artifact arrays; the first add() copies them."""
+        index = cls()
+        index._buf, index._lengths = arrays["templates"], arrays["lengths"]
+        index._n = len(index._lengths)
+        classes = meta["classes"]
+        index.labels = [classes[i] for i in arrays["y"].tolist()]
+        return index
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def templates(self) -> np.ndarray:
+        """Padded (T, L, 2) template array; rows are valid up to lengths[i]."""
+        return self._buf[:self._n]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._lengths[:self._n]
+
+    def _reserve(self, count: int, length: int):
+        """Grows the padded buffer (amortized doubling on the template axis) to fit count x length."""
+        cap, max_len = self._buf.shape[:2]
+        if count <= cap and length <= max_len:
+            return
+        new_cap = max(count, cap * 2 if count > cap else cap, 16)
+        buf = np.zeros((new_cap, max(length, max_len), 2), dtype=np.float64)
+        buf[:self._n, :max_len] = self._buf[:self._n]
+        lengths = np.zeros(new_cap, dtype=np.int64)
+        lengths[:self._n] = self._lengths[:self._n]
+        self._buf, self._lengths = buf, lengths
+
+    def add(self, template: np.ndarray, label: str):
+        self._reserve(self._n + 1, len(template))
+        self._buf[self._n, :len(template)] = template
+        self._buf[self._n, len(template):] = 0.0
+        self._lengths[self._n] = len(template)
+        self._n += 1
+        self.labels.append(label)
+
+    def with_example(self, template: np.ndarray, label: str) -> "DTWIndex":
+        """
+        Copy-on-write add(): a new index with the template appended, sharing this one's
+        template buffer past its own length (see KNNIndex.with_example). Only call it
+        on the newest index.
+        """
+        index = copy.copy(self)
+        index.labels = list(self.labels)
+        index.add(template, label)
+        return index
+
+    def query(self, query: np.ndarray, k: int = 5,
+              mask: Optional[np.ndarray] = None) -> Tuple[List[Tuple[str, float]], Dict[str, int]]:
+        """
+        Returns up to k (label, distance) pairs for the closest distinct labels, closest first,
+        and the query's pruning counts. mask optionally restricts the search to a boolean
+        subset of templates.
+        """
+        query = np.asarray(query, dtype=np.float64)
+        stats = {"templates": self._n, "kim_pruned": 0, "lb_pruned": 0, "abandoned": 0, "computed": 0}
+        if self._n == 0 or len(query) == 0:
+            return [], stats
+
+        templates, lengths = self.templates, self.lengths
+        candidates = np.arange(self._n) if mask is None else np.flatnonzero(mask[:self._n])
+
+        # LB_Kim: every warping path contains the first and the last cell
+        first = np.linalg.norm(templates[candidates, 0] - query[0], axis=1)
+        last = np.linalg.norm(templates[candidates, lengths[candidates] - 1] - query[-1], axis=1)
+        distinct = (len(query) > 1) | (lengths[candidates] > 1)
+        lb_kim = first + np.where(distinct, last, 0.0)
+        order = np.argsort(lb_kim, kind="stable")
+        candidates, lb_kim = candidates[order], lb_kim[order]
+
+        best: Dict[str, float] = {}
+        threshold = np.inf
+        for start in range(0, len(candidates), CHUNK_SIZE):
+            chunk = candidates[start:start + CHUNK_SIZE]
+            keep = lb_kim[start:start + CHUNK_SIZE] < threshold
+            if not keep.any():
+                # Candidates are sorted by LB_Kim, so nothing later can qualify either
+                stats["kim_pruned"] += len(candidates) - start
+                break
+            stats["kim_pruned"] += int((~keep).sum())
+            chunk = chunk[keep]
+
+            distances = self._chunk_distances(query, chunk, threshold, stats)
+            for idx, dist in zip(chunk, distances):
+                if dist < best.get(self.labels[idx], np.inf):
+                    best[self.labels[idx]] = float(dist)
+            if len(best) >= k:
+                threshold = sorted(best.values())[k - 1]
+
+        ranked = sorted(best.items(), key=lambda x: x[1])
+        return ranked[:k], stats
+
+    def _chunk_distances(self, query: np.ndarray, chunk: np.ndarray, threshold: float,
+                         stats: Dict[str, int]) -> np.ndarray:
+        """DTW distances for a chunk of template indices; inf for pruned or abandoned ones."""
+        lengths = self._lengths[chunk]
+        width = int(lengths.max())
+        cost = _pair_costs(query, self._buf[chunk, :width])
+        valid = np.arange(width)[None, :] < lengths[:, None]
+        # Padding costs nothing, so it never feeds into valid cells of the prefix sums
+        cost *= valid[:, None, :]
+
+        out = np.full(len(chunk), np.inf)
+
+        # Row-minimum bound: every query point is matched to at least one template point
+        row_min = np.where(valid[:, None, :], cost, np.inf).min(axis=2)
+        active = np.flatnonzero(row_min.sum(axis=1) < threshold)
+        stats["lb_pruned"] += len(chunk) - len(active)
+        if len(active) == 0:
+            return out
+        cost, valid, lengths = cost[active], valid[active], lengths[active]
+
+        # Row-wise DP. Within a row D[j] = c[j] + min(a[j], D[j - 1]) with a the best entry
+        # from the previous row; with P the prefix sum of c this is
+        # D[j] = P[j] + min_{k <= j}(a[k] + c[k] - P[k]), i.e. one accumulate per row.
+        D = np.cumsum(cost[:, 0, :], axis=1)
+        for i in range(1, len(query)):
+            row = cost[:, i, :]
+            a = D.copy()
+            np.minimum(D[:, 1:], D[:, :-1], out=a[:, 1:])
+            P = np.cumsum(row, axis=1)
+            D = P + np.minimum.accumulate(a + row - P, axis=1)
+
+            # Early abandoning: every path crosses every row
+            alive = np.where(valid, D, np.inf).min(axis=1) < threshold
+            if not alive.all():
+                stats["abandoned"] += int((~alive).sum())
+                active, D, cost, valid, lengths = active[alive], D[alive], cost[alive], valid[alive], lengths[alive]
+                if len(active) == 0:
+                    return out
+
+        stats["computed"] += len(active)
+        out[active] = D[np.arange(len(active)), lengths - 1]
+        return out
@@ -0,0 +1,86 @@
+import base64
+import datetime
+import json
+import zlib
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import LargeBinary, literal, tuple_, type_coerce
+
+from trackpad_math.db import Database, Drawing, decode_points
+from trackpad_math.processing import array_to_points
+
+EXPORT_FORMATS = ("json", "ndjson")
+# "json": {x, y, t} lists; "packed": base64 of the stored points blob (db.encode_points)
+POINTS_ENCODINGS = ("json", "packed")
+# Rows read per transaction, and joined into one chunk
+ROWS_PER_CHUNK = 500
+
+def _naive_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """value as naive UTC, the way timestamps are stored (CURRENT_TIMESTAMP); naive values are taken as UTC."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+def _read_chunk(db: Database, label: Optional[str], since: Optional[datetime.datetime],
+                until: Optional[datetime.datetime], after: Optional[Tuple[datetime.datetime, Any]]) -> List[Any]:
+    """The next ROWS_PER_CHUNK drawings in (timestamp, id) order after the key after."""
+    with db.session_scope() as session:
+        # The blob as stored: packed exports skip decoding it entirely
+        q = session.query(
+            Drawing.id, Drawing.label, Drawing.timestamp, type_coerce(Drawing.points, LargeBinary).label("blob")
+        )
+        if label:
+            q = q.filter(Drawing.label == label)
+        if since is not None:
+            q = q.filter(Drawing.timestamp >= since)
+        if until is not None:
+            q = q.filter(Drawing.timestamp < until)
+        if after is not None:
+            # Typed like the columns, so they are bound in the stored format
+            q = q.filter(tuple_(Drawing.timestamp, Drawing.id) > tuple_(
+                literal(after[0], Drawing.timestamp.type), literal(after[1], Drawing.id.type)
+            ))
+        return q.order_by(Drawing.timestamp, Drawing.id).limit(ROWS_PER_CHUNK).all()
+
+def iter_export(db: Database, fmt: str = "json", points: str = "json", label: Optional[str] = None,
+                since: Optional[datetime.datetime] = None,
+                until: Optional[datetime.datetime] = None) -> Iterator[str]:
+    """
+    Yields the drawings as a JSON array ("json") or one object per line ("ndjson"),
+    in chunks of ROWS_PER_CHUNK drawings, so memory use doesn't depend on how many
+    drawings there are. label, since and until filter by label and by timestamp
+    (since inclusive, until exclusive); timezone-aware bounds are converted to UTC.
+
+    Each chunk is read in its own short transaction, seeking past the last row of
+    the previous one on the (timestamp, id) indexes, so no database lock is held
+    while the client reads the response and writers aren't blocked by a slow download.
+    """
+    since, until = _naive_utc(since), _naive_utc(until)
+    if fmt == "json":
+        yield "["
+    after = None
+    while chunk := _read_chunk(db, label, since, until, after):
+        first = after is None
+        after = (chunk[-1].timestamp, chunk[-1].id)
+        items = [json.dumps({
+            "label": r.label,
+            "points": (
+                base64.b64encode(r.blob).decode("ascii") if points == "packed"
+                else array_to_points(decode_points(r.blob))
+            ),
+            "created_at": r.timestamp.isoformat() if r.timestamp else None,
+        }) for r in chunk]
+        if fmt == "ndjson":
+            yield "\n".join(items) + "\n"
+        else:
+            yield ("" if first else ",\n") + ",\n".join(items)
+    if fmt == "json":
+        yield "]"
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Compresses a stream of text chunks into one gzip file, chunk by chunk."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
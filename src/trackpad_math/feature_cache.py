@@ -0,0 +1,94 @@
+import logging
+from dataclasses import dataclass
+from uuid import UUID
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from trackpad_math.db import Drawing, DrawingFeatures
+from trackpad_math.processing import (
+    NUM_FEATURES, PIPELINE_VERSION, compute_pipeline_outputs
+)
+
+# Drawings recomputed per batch when refreshing stale cache entries
+REFRESH_CHUNK_SIZE = 500
+
+@dataclass
+class TrainingSet:
+    """Everything a SymbolClassifier needs to fit, read from the feature cache."""
+    labels: List[str]
+    ids: List[UUID]               # drawing ids, same order as labels
+    features: np.ndarray          # (D, NUM_FEATURES)
+    templates: np.ndarray         # ragged (K, 2) DTW sequences
+    template_offsets: np.ndarray  # (D + 1,)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+def refresh_features(session: Session, on_chunk: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Computes cache entries for drawings that have none, or whose entry was produced
+    by a different pipeline version. Returns the number of drawings recomputed.
+    on_chunk(done, total) is called after each chunk is flushed.
+    """
+    logger = logging.getLogger("app")
+    stale_ids = [
+        r[0] for r in session.query(Drawing.id)
+        .outerjoin(DrawingFeatures, DrawingFeatures.drawing_id == Drawing.id)
+        .filter(or_(DrawingFeatures.drawing_id.is_(None), DrawingFeatures.pipeline_version != PIPELINE_VERSION))
+        .all()
+    ]
+    if not stale_ids:
+        return 0
+
+    logger.debug(f"Computing cached features for {len(stale_ids)} drawings.")
+    for i in range(0, len(stale_ids), REFRESH_CHUNK_SIZE):
+        chunk = stale_ids[i:i + REFRESH_CHUNK_SIZE]
+        rows = session.query(Drawing.id, Drawing.points).filter(Drawing.id.in_(chunk)).all()
+        features, templates, template_offsets = compute_pipeline_outputs([r.points for r in rows])
+
+        delete_features(session, [r.id for r in rows])
+        session.add_all([
+            DrawingFeatures(
+                drawing_id=r.id,
+                pipeline_version=PIPELINE_VERSION,
+                features=features[j].tobytes(),
+                template=templates[template_offsets[j]:template_offsets[j + 1]].tobytes(),
+            )
+            for j, r in enumerate(rows)
+        ])
+        session.flush()
+        if on_chunk is not None:
+            on_chunk(min(i + REFRESH_CHUNK_SIZE, len(stale_ids)), len(stale_ids))
+    return len(stale_ids)
+
+def load_training_set(session: Session, on_chunk: Optional[Callable[[int, int], None]] = None) -> TrainingSet:
+    """Reads features and templates for every drawing, recomputing stale entries first."""
+    refresh_features(session, on_chunk)
+    rows = (
+        session.query(Drawing.id, Drawing.label, DrawingFeatures.features, DrawingFeatures.template)
+        .join(DrawingFeatures, DrawingFeatures.drawing_id == Drawing.id)
+        .all()
+    )
+
+    features = np.frombuffer(b"".join(r.features for r in rows), dtype=np.float64).reshape(-1, NUM_FEATURES)
+    templates = np.frombuffer(b"".join(r.template for r in rows), dtype=np.float64).reshape(-1, 2)
+    template_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    # 16 bytes per (x, y) float64 pair
+    np.cumsum([len(r.template) // 16 for r in rows], out=template_offsets[1:])
+
+    return TrainingSet(
+        labels=[r.label for r in rows],
+        ids=[r.id for r in rows],
+        features=features,
+        templates=templates,
+        template_offsets=template_offsets,
+    )
+
+def delete_features(session: Session, drawing_ids: Optional[Sequence] = None):
+    """Drops cache entries for the given drawings, or all entries if drawing_ids is None."""
+    q = session.query(DrawingFeatures)
+    if drawing_ids is not None:
+        q = q.filter(DrawingFeatures.drawing_id.in_(list(drawing_ids)))
+    q.delete(synchronize_session=False)
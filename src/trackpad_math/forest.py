@@ -0,0 +1,130 @@
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+class PackedForest:
+    """
+    Inference-only copy of a fitted RandomForestClassifier, flattened into node arrays.
+
+    The nodes of all trees are concatenated; children hold global node indices and
+    leaves point to themselves, so one sample walks every tree at once: each step is a
+    handful of vectorized gathers over the T current nodes, repeated max_depth times.
+
+    predict_proba reproduces sklearn bit for bit: the sample is cast to float32 like
+    sklearn's input validation, each tree contributes its leaf's class fractions
+    (tree_.value, scikit-learn >= 1.4), the contributions are summed in tree order
+    and the sum is divided by the number of trees.
+    """
+
+    # Retraining replaces every tree
+    appendable = False
+
+    def __init__(self):
+        self.classes: List[str] = []
+        self.n_features = 0
+        self.max_depth = 0
+        self.roots = np.zeros(0, dtype=np.int64)
+        self.feature = np.zeros(0, dtype=np.int64)
+        self.threshold = np.zeros(0, dtype=np.float64)
+        self.left = np.zeros(0, dtype=np.int64)
+        self.right = np.zeros(0, dtype=np.int64)
+        self.missing_left = np.zeros(0, dtype=bool)
+        self.value = np.zeros((0, 0), dtype=np.float64)
+
+    def __len__(self) -> int:
+        """Number of trees."""
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "PackedForest":
+        """Packs a fitted single-output RandomForestClassifier."""
+        forest = cls()
+        forest.classes = [str(c) for c in model.classes_]
+        forest.n_features = int(model.n_features_in_)
+        n_classes = len(forest.classes)
+
+        trees = [est.tree_ for est in model.estimators_]
+        sizes = np.array([t.node_count for t in trees], dtype=np.int64)
+        forest.roots = np.zeros(len(trees), dtype=np.int64)
+        np.cumsum(sizes[:-1], out=forest.roots[1:])
+        forest.max_depth = max((int(t.max_depth) for t in trees), default=0)
+
+        features, thresholds, lefts, rights, missing, values = [], [], [], [], [], []
+        for root, t in zip(forest.roots, trees):
+            nodes = np.arange(t.node_count, dtype=np.int64)
+            leaf = t.children_left < 0
+            lefts.append(np.where(leaf, nodes, t.children_left) + root)
+            rights.append(np.where(leaf, nodes, t.children_right) + root)
+            features.append(np.where(leaf, 0, t.feature))
+            thresholds.append(t.threshold)
+            missing.append(np.asarray(t.missing_go_to_left, dtype=bool))
+            values.append(t.value[:, 0, :n_classes])
+
+        forest.feature = np.concatenate(features).astype(np.int64)
+        forest.threshold = np.concatenate(thresholds).astype(np.float64)
+        forest.left = np.concatenate(lefts)
+        forest.right = np.concatenate(rights)
+        forest.missing_left = np.concatenate(missing)
+        forest.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        return forest
+
+    def to_artifact(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        arrays = {
+            "roots": self.roots, "feature": self.feature, "threshold": self.threshold,
+            "left": self.left, "right": self.right, "missing_left": self.missing_left, "value": self.value,
+        }
+        return arrays, {"classes": self.classes, "n_features": self.n_features, "max_depth": self.max_depth}
+
+    @classmethod
+    def from_artifact(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "PackedForest":
+        forest = cls()
+        for name in ("roots", "feature", "threshold", "left", "right", "missing_left", "value"):
+            setattr(forest, name, arrays[name])
+        forest.classes = list(meta["classes"])
+        forest.n_features, forest.max_depth = meta["n_features"], meta["max_depth"]
+        return forest
+
+    def apply(self, x: np.ndarray) -> np.ndarray:
+        """Global leaf index reached in each tree by a single sample."""
+        return self.apply_batch(np.asarray(x).reshape(1, -1))[0]
+
+    def apply_batch(self, X: np.ndarray) -> np.ndarray:
+        """(B, T) leaf indices for a batch of samples; all B * T walks advance together."""
+        X = np.asarray(X, dtype=np.float32).reshape(len(X), -1).astype(np.float64)
+        has_nan = bool(np.isnan(X).any())
+        rows = np.arange(len(X))[:, None]
+        node = np.tile(self.roots, (len(X), 1))
+        for _ in range(self.max_depth):
+            value = X[rows, self.feature[node]]
+            go_left = value <= self.threshold[node]
+            if has_nan:
+                go_left |= np.isnan(value) & self.missing_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        """Class probabilities for a single sample, in the order of self.classes."""
+        return self.predict_proba_batch(np.asarray(x).reshape(1, -1))[0]
+
+    def predict_proba_batch(self, X: np.ndarray) -> np.ndarray:
+        """(B, C) class probabilities for a batch of samples."""
+        if len(self.roots) == 0:
+            return np.zeros((len(X), len(self.classes)))
+        leaf_values = self.value[self.apply_batch(X)]
+        # cumsum accumulates strictly in tree order, like sklearn's running out += proba
+        proba = np.cumsum(leaf_values, axis=1)[:, -1]
+        proba /= len(self.roots)
+        return proba
+
+    def rank(self, x: np.ndarray) -> List[Tuple[str, float]]:
+        """All labels with their probability, most likely first (ties in classes order)."""
+        return self.rank_batch(np.asarray(x).reshape(1, -1))[0]
+
+    def rank_batch(self, X: np.ndarray) -> List[List[Tuple[str, float]]]:
+        """rank() for each row of X, with one tree walk for the whole batch."""
+        if len(self.roots) == 0:
+            return [[] for _ in range(len(X))]
+        ranked = []
+        for proba in self.predict_proba_batch(X):
+            order = np.argsort(-proba, kind="stable")
+            ranked.append([(self.classes[i], float(proba[i])) for i in order])
+        return ranked
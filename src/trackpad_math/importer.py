@@ -0,0 +1,226 @@
+import base64
+import binascii
+import codecs
+import json
+import logging
+import re
+import struct
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from trackpad_math.db import Drawing, decode_points
+from trackpad_math.label_counts import add_label_counts
+from trackpad_math.processing import points_to_array
+
+# Bytes read from the upload at a time
+READ_SIZE = 1 << 16
+# Drawings inserted (and committed) per batch
+CHUNK_SIZE = 500
+# Unparsed bytes allowed to pile up while looking for the end of one item; past
+# this the item is taken to be malformed rather than read to the end of the file
+MAX_ITEM_CHARS = 16 << 20
+# Skipped items whose reasons are kept for the status
+MAX_REPORTED_ERRORS = 20
+
+_WHITESPACE = re.compile(r"\s*")
+# Characters that can continue a JSON number
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+class ImportBusy(Exception):
+    """Another import is still running."""
+
+def iter_json_array(stream: BinaryIO, on_read: Optional[Callable[[int], None]] = None) -> Iterator[Any]:
+    """
+    Yields the items of the JSON array in stream, reading READ_SIZE bytes at a time,
+    so only the item being parsed is held in memory. on_read(n) is called with the
+    size of each read. Raises ValueError if the document isn't a well-formed array.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8-sig")()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = stream.read(READ_SIZE)
+        if on_read is not None:
+            on_read(len(data))
+        eof = not data
+        buf = buf[pos:] + text.decode(data, final=eof)
+        pos = 0
+
+    def next_char() -> str:
+        """Skips whitespace; the next character, or "" at the end of the document."""
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return buf[pos:pos + 1]
+            fill()
+
+    if next_char() != "[":
+        raise ValueError("JSON must be a list of drawings")
+    pos += 1
+    if next_char() == "]":
+        pos += 1
+    else:
+        while True:
+            next_char()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    # A number cut off by the end of the buffer parses as a shorter one
+                    if eof or (end < len(buf) and buf[end] not in _NUMBER_CHARS):
+                        break
+                    error = "truncated value"
+                except json.JSONDecodeError as e:
+                    # Most likely the item continues past what has been read so far
+                    error = str(e)
+                if eof or len(buf) - pos > MAX_ITEM_CHARS:
+                    raise ValueError(f"Invalid JSON: {error}")
+                fill()
+            pos = end
+            yield item
+            separator = next_char()
+            pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError("Invalid JSON: expected ',' or ']' after an item")
+    if next_char():
+        raise ValueError("Invalid JSON: unexpected data after the list")
+
+def validate_item(item: Any) -> Tuple[str, np.ndarray]:
+    """The label and (N, 3) points of an exported drawing. Raises ValueError if it isn't one."""
+    if not isinstance(item, dict):
+        raise ValueError("not an object")
+    label = item.get("label")
+    if not isinstance(label, str) or not label:
+        raise ValueError("missing label")
+    points = item.get("points")
+    if isinstance(points, str):
+        # Exported with points=packed
+        try:
+            arr = decode_points(base64.b64decode(points, validate=True))
+        except (binascii.Error, struct.error, ValueError):
+            raise ValueError("points are not a valid packed blob")
+    elif not isinstance(points, list) or not points:
+        raise ValueError("missing points")
+    else:
+        try:
+            arr = points_to_array(points)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("points must be {x, y, t} objects with numeric values")
+    if not len(arr):
+        raise ValueError("missing points")
+    if not np.isfinite(arr).all():
+        raise ValueError("points must be finite")
+    return label, arr
+
+class ImportManager:
+    """
+    Imports exported training data. The upload is parsed item by item and inserted
+    in batches of CHUNK_SIZE, each committed on its own, so memory use doesn't grow
+    with the file and other requests aren't locked out of the database meanwhile.
+    Items that aren't valid drawings are skipped and reported.
+
+    One import runs at a time; status() reports the progress of the current or
+    last one.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("app")
+        self._lock = threading.Lock()
+        self._job: Optional[Dict[str, Any]] = None
+        self._next_id = 1
+
+    def run(self, stream: BinaryIO, session: Session, total_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Imports the JSON array in stream; blocking. Returns the final status. Raises
+        ImportBusy if an import is already running, or ValueError if the file isn't
+        a JSON list, in which case the chunks committed before the error stay imported.
+        """
+        with self._lock:
+            if self._job is not None and self._job["state"] == "running":
+                raise ImportBusy("An import is already running")
+            job = self._job = {
+                "job_id": self._next_id,
+                "state": "running",
+                "started_at": datetime.now().isoformat(),
+                "duration_s": None,
+                "bytes_read": 0,
+                "total_bytes": total_bytes,
+                "progress": 0.0,
+                "imported": 0,
+                "skipped": 0,
+                "errors": [],
+                "error": None,
+                "_started": time.monotonic(),
+            }
+            self._next_id += 1
+
+        def on_read(n: int):
+            with self._lock:
+                job["bytes_read"] += n
+                if total_bytes:
+                    job["progress"] = min(job["bytes_read"] / total_bytes, 1.0)
+
+        def flush(rows):
+            # executemany through the Core insert; no ORM objects per drawing
+            session.execute(insert(Drawing), rows)
+            add_label_counts(session, Counter(row["label"] for row in rows))
+            session.commit()
+            with self._lock:
+                job["imported"] += len(rows)
+
+        rows = []
+        try:
+            for index, item in enumerate(iter_json_array(stream, on_read)):
+                try:
+                    label, points = validate_item(item)
+                except ValueError as e:
+                    with self._lock:
+                        job["skipped"] += 1
+                        if len(job["errors"]) < MAX_REPORTED_ERRORS:
+                            job["errors"].append({"index": index, "error": str(e)})
+                    continue
+                # Ignore the exported timestamp, let it be now
+                rows.append({"label": label, "points": points})
+                if len(rows) >= CHUNK_SIZE:
+                    flush(rows)
+                    rows = []
+            if rows:
+                flush(rows)
+        except Exception as e:
+            session.rollback()
+            self._finish(job, "failed", str(e))
+            raise
+        self._finish(job, "succeeded")
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._job is None:
+                return {"state": "idle"}
+            status = dict(self._job, errors=list(self._job["errors"]))
+            started = status.pop("_started")
+            if status["state"] == "running":
+                status["duration_s"] = round(time.monotonic() - started, 3)
+            return status
+
+    def _finish(self, job: Dict[str, Any], state: str, error: Optional[str] = None):
+        with self._lock:
+            job.update(
+                state=state,
+                error=error,
+                progress=1.0 if state == "succeeded" else job["progress"],
+                duration_s=round(time.monotonic() - job["_started"], 3),
+            )
+            self.logger.info(
+                f"Import {job['job_id']} {state}: {job['imported']} drawings imported, {job['skipped']} skipped."
+            )
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from trackpad_math.model import SymbolClassifier
+from trackpad_math.processing import DrawingLike
+
+# Overload policies: refuse the request, or answer it in-process with the cheap model
+OVERLOAD_POLICIES = ("reject", "degrade")
+# Number of recent requests the wait/service time stats are computed over
+STATS_WINDOW = 256
+
+Predictions = List[Tuple[str, float]]
+
+class InferenceBusy(Exception):
+    """Raised when the inference queue is full and the request was not admitted."""
+
+# The worker process's classifier; set by _init_worker
+_classifier: Optional[SymbolClassifier] = None
+
+def _init_worker(model_type: str, base_path: str, cascade_shortlist: int):
+    global _classifier
+    _classifier = SymbolClassifier(model_type, base_path=base_path, cascade_shortlist=cascade_shortlist)
+    # Memory-maps the artifact; a missing model is loaded on the first request instead
+    _classifier.load()
+
+def _worker_predict(drawings: List[DrawingLike], version: int) -> Tuple[List[Predictions], int, float]:
+    """
+    Runs in a worker process. The app saves a model before publishing it, so the
+    artifact is at least as new as the version the batch was made against; reload
+    it when the worker's copy is older. Returns (predictions per drawing, model
+    version, start time).
+    """
+    started = time.time()
+    if _classifier.model_version < version:
+        # A concurrent full rewrite can remove files between reading the header and
+        # opening them; the second attempt sees the new header
+        if not _classifier.load() and not _classifier.load() and _classifier.model is None:
+            return [[("Uninitialized", 0.0)] for _ in drawings], version, started
+    predictions, model_version = _classifier.predict_batch(drawings)
+    return predictions, model_version, started
+
+class InferencePool:
+    """
+    Runs classifications in worker processes that each hold the model (memory-mapped
+    from the saved artifact), off the event loop and off Starlette's shared threadpool.
+
+    At most workers + queue_size requests are in flight. A request beyond that is
+    handled by the overload policy: "reject" raises InferenceBusy, "degrade" answers
+    in the threadpool from SymbolClassifier.predict_fast (the cascade's KNN stage),
+    falling back to a rejection for model types without a cheaper model. With workers=0 predictions run in the
+    threadpool against the app's own classifier, and only admission control applies.
+
+    Admitted requests are micro-batched: the first request of a batch waits up to
+    batch_window_ms for others to join, and a batch is sent as soon as it holds
+    batch_size requests. Each batch is one SymbolClassifier.predict_batch call.
+    """
+
+    def __init__(self, classifier: SymbolClassifier, workers: int = 1, queue_size: int = 32,
+                 overload: str = "degrade", batch_window_ms: float = 2.0, batch_size: int = 16):
+        if overload not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy: {overload}")
+        self.classifier = classifier
+        self.workers = max(0, workers)
+        self.queue_size = max(0, queue_size)
+        self.overload = overload
+        self.batch_window = max(0.0, batch_window_ms) / 1000
+        self.batch_size = max(1, batch_size)
+        self.logger = logging.getLogger("app")
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "degraded": 0, "cancelled": 0, "batches": 0}
+        # (wait_ms, service_ms) of recent requests, and sizes of recent batches
+        self._recent: deque = deque(maxlen=STATS_WINDOW)
+        self._batch_sizes: deque = deque(maxlen=STATS_WINDOW)
+        # Requests of the batch being gathered, as (points, future, submit time)
+        self._pending: List[Tuple[DrawingLike, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        if self.workers:
+            self._executor = self._new_executor()
+            self._warmup()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.classifier.model_type, self.classifier.base_path, self.classifier.cascade_shortlist),
+        )
+
+    def _warmup(self):
+        # Workers are spawned on the first submit; do it now instead of on the first stroke
+        drawings = [np.zeros((1, 3))]
+        for _ in range(self.workers):
+            self._executor.submit(_worker_predict, drawings, self.classifier.snapshot.version)
+
+    async def predict(self, points: DrawingLike) -> Tuple[Predictions, int, bool]:
+        """
+        Classifies points. Returns (predictions, model version, degraded), where
+        degraded tells that the cheap model answered because the queue was full.
+        Raises InferenceBusy if the request was rejected.
+        """
+        if self._in_flight >= self.workers + self.queue_size:
+            return await self._overloaded(points)
+
+        self._in_flight += 1
+        self._counts["submitted"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((points, future, time.time()))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        try:
+            predictions, version, wait_ms, service_ms = await future
+        except asyncio.CancelledError:
+            # The caller no longer wants the result (e.g. superseded by a newer request)
+            self._counts["cancelled"] += 1
+            raise
+        except Exception:
+            self._counts["failed"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+        self._counts["completed"] += 1
+        self._recent.append((wait_ms, service_ms))
+        return predictions, version, False
+
+    def _flush(self):
+        """Sends the gathered requests off as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # Requests cancelled while waiting for the batch don't need to be computed
+        batch = [request for request in self._pending if not request[1].done()]
+        self._pending = []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            # The loop only keeps weak references to tasks
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[DrawingLike, asyncio.Future, float]]):
+        self._counts["batches"] += 1
+        self._batch_sizes.append(len(batch))
+        try:
+            results, version, started = await self._submit([points for points, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.time()
+        for (_, future, submitted), predictions in zip(batch, results):
+            # Skips requests whose caller went away meanwhile
+            if not future.done():
+                future.set_result((predictions, version, (started - submitted) * 1000, (finished - started) * 1000))
+
+    async def _submit(self, drawings: List[DrawingLike]) -> Tuple[List[Predictions], int, float]:
+        if self._executor is None:
+            started = time.time()
+            predictions, version = await run_in_threadpool(self.classifier.predict_batch, drawings)
+            return predictions, version, started
+        version = self.classifier.snapshot.version
+        try:
+            return await asyncio.wrap_future(self._executor.submit(_worker_predict, drawings, version))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OS); start a new pool and answer this batch here
+            self.logger.error("Inference worker pool broke; restarting it.")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self._warmup()
+            started = time.time()
+            predictions, version = await run_in_threadpool(self.classifier.predict_batch, drawings)
+            return predictions, version, started
+
+    async def _overloaded(self, points: DrawingLike) -> Tuple[Predictions, int, bool]:
+        if self.overload == "degrade":
+            # Cheaper than the full model, but still not something to run on the event loop
+            result = await run_in_threadpool(self.classifier.predict_fast, points)
+            if result is not None:
+                self._counts["degraded"] += 1
+                return result[0], result[1], True
+        self._counts["rejected"] += 1
+        raise InferenceBusy(f"Inference queue is full ({self._in_flight} requests in flight)")
+
+    def stats(self) -> Dict[str, Any]:
+        waits = np.array([w for w, _ in self._recent])
+        services = np.array([s for _, s in self._recent])
+        stats: Dict[str, Any] = {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "overload": self.overload,
+            "batch_window_ms": self.batch_window * 1000,
+            "batch_size": self.batch_size,
+            "in_flight": self._in_flight,
+            # Requests waiting for a free worker process (the threadpool has no fixed size);
+            # approximate, since a worker processes a whole batch at once
+            "queue_depth": max(0, self._in_flight - self.workers) if self.workers else 0,
+            # Requests in the batch being gathered
+            "gathering": len(self._pending),
+        }
+        stats.update(self._counts)
+        stats["mean_batch_size"] = round(float(np.mean(self._batch_sizes)), 3) if self._batch_sizes else None
+        for name, values in (("wait_ms", waits), ("service_ms", services)):
+            stats[name] = {
+                "mean": round(float(values.mean()), 3),
+                "p95": round(float(np.percentile(values, 95)), 3),
+                "max": round(float(values.max()), 3),
+            } if len(values) else None
+        return stats
+
+    def shutdown(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._executor is not None:
+            # Waiting lets the workers exit cleanly; queued batches are cancelled
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
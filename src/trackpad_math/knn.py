@@ -0,0 +1,270 @@
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+
+class KNNIndex:
+    """
+    Append-only k-nearest-neighbour classifier.
+
+    Feature rows live in a preallocated buffer that grows by doubling, and labels are
+    stored as integer ids into a label table, so add() is amortized O(1). Each row's
+    squared norm is cached, so distances to a query are one matrix-vector product:
+    |x - q|^2 = |x|^2 - 2 x.q + |q|^2.
+
+    Predictions match KNeighborsClassifier(n_neighbors=k) with uniform weights: the
+    probability of a label is its share of the k nearest neighbours, and ties rank in
+    sorted label order (the order of sklearn's classes_).
+    """
+
+    # Storage dtype of the feature buffer
+    dtype = np.float64
+    # Stored rows never change once written, so a saved artifact can grow in place
+    appendable = True
+
+    def __init__(self, n_neighbors: int = 3):
+        self.n_neighbors = n_neighbors
+        self._X = np.zeros((0, 0), dtype=self.dtype)
+        self._y = np.zeros(0, dtype=np.int64)
+        self._norms = np.zeros(0, dtype=self.dtype)
+        self._n = 0
+        self.classes: List[str] = []
+        self._class_ids: Dict[str, int] = {}
+        # Position of each class id in sorted label order, for tie-breaking
+        self._class_rank = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def X(self) -> np.ndarray:
+        return self._X[:self._n]
+
+    @property
+    def y(self) -> np.ndarray:
+        """Integer label ids into self.classes."""
+        return self._y[:self._n]
+
+    def labels(self) -> List[str]:
+        return [self.classes[i] for i in self.y]
+
+    def fit(self, X: np.ndarray, labels: Sequence[str]) -> "KNNIndex":
+        """Replaces the stored examples."""
+        self.classes, self._class_ids = [], {}
+        self._n = 0
+        self._X = np.array(X, dtype=self.dtype, copy=True)
+        self._y = np.array([self._class_id(label) for label in labels], dtype=np.int64)
+        self._grown(len(self._X))
+        self._n = len(self._X)
+        self._update_class_rank()
+        self._rows_written(0, self._n)
+        return self
+
+    def add(self, x: np.ndarray, label: str):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        if self._X.shape[1] != len(x):
+            if self._n:
+                raise ValueError(f"Expected {self._X.shape[1]} features, got {len(x)}")
+            self._X = np.zeros((0, len(x)), dtype=self.dtype)
+        self._reserve(self._n + 1)
+        num_classes = len(self.classes)
+        self._X[self._n] = x
+        self._y[self._n] = self._class_id(label)
+        self._rows_written(self._n, self._n + 1)
+        self._n += 1
+        if len(self.classes) != num_classes:
+            self._update_class_rank()
+
+    def with_example(self, x: np.ndarray, label: str) -> "KNNIndex":
+        """
+        Copy-on-write add(): returns a new index with the example appended and leaves
+        this one untouched, so readers of this index never see a partial update. The new
+        row is written to the shared growth buffers past this index's rows (or to fresh
+        buffers once they are full). Only call it on the newest index: two forks of the
+        same index would claim the same slot.
+        """
+        index = self._fork()
+        index.classes = list(self.classes)
+        index._class_ids = dict(self._class_ids)
+        index.add(x, label)
+        return index
+
+    def _fork(self) -> "KNNIndex":
+        # Shallow copy sharing the buffers; copy.copy would go through __getstate__
+        index = object.__new__(type(self))
+        index.__dict__.update(self.__dict__)
+        return index
+
+    def _class_id(self, label: str) -> int:
+        label = str(label)
+        if label not in self._class_ids:
+            self._class_ids[label] = len(self.classes)
+            self.classes.append(label)
+        return self._class_ids[label]
+
+    def _update_class_rank(self):
+        order = np.argsort(np.array(self.classes, dtype=object), kind="stable")
+        self._class_rank = np.empty(len(order), dtype=np.int64)
+        self._class_rank[order] = np.arange(len(order))
+
+    def _reserve(self, count: int):
+        cap = len(self._X)
+        if count <= cap:
+            return
+        new_cap = max(count, cap * 2, 64)
+        X = np.zeros((new_cap, self._X.shape[1]), dtype=self.dtype)
+        X[:self._n] = self._X[:self._n]
+        y = np.zeros(new_cap, dtype=np.int64)
+        y[:self._n] = self._y[:self._n]
+        self._X, self._y = X, y
+        self._grown(new_cap)
+
+    def _grown(self, capacity: int):
+        norms = np.zeros(capacity, dtype=self.dtype)
+        norms[:self._n] = self._norms[:self._n]
+        self._norms = norms
+
+    def _rows_written(self, start: int, stop: int):
+        rows = self._X[start:stop]
+        self._norms[start:stop] = np.einsum("ij,ij->i", rows, rows)
+
+    def _sq_distances(self, x: np.ndarray) -> np.ndarray:
+        q = x.astype(self.dtype)
+        d2 = self.X @ q
+        d2 *= -2.0
+        d2 += self._norms[:self._n]
+        d2 += np.dot(q, q)
+        # Cancellation can leave tiny negatives for (near) duplicates
+        np.maximum(d2, 0.0, out=d2)
+        return d2
+
+    def kneighbors(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, indices) of the k nearest stored examples, closest first."""
+        x = np.asarray(x, dtype=np.float64).ravel()
+        k = min(k, self._n)
+        if k == 0:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        d2 = self._sq_distances(x)
+        idx = np.argpartition(d2, k - 1)[:k] if k < self._n else np.arange(self._n)
+        idx = idx[np.argsort(d2[idx], kind="stable")]
+        return np.sqrt(d2[idx]), idx
+
+    def kneighbors_batch(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        kneighbors() for each row of X, as (B, k) distances and indices. The distances of
+        the whole batch are one matrix-matrix product, so they can differ from
+        kneighbors() in the last bits, which may reorder (near) equidistant neighbours.
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        k = min(k, self._n)
+        if k == 0:
+            return np.zeros((len(X), 0)), np.zeros((len(X), 0), dtype=np.int64)
+        q = X.astype(self.dtype)
+        d2 = q @ self.X.T
+        d2 *= -2.0
+        d2 += self._norms[:self._n]
+        d2 += np.einsum("ij,ij->i", q, q)[:, None]
+        np.maximum(d2, 0.0, out=d2)
+        if k < self._n:
+            idx = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(self._n), (len(X), 1))
+        d2 = np.take_along_axis(d2, idx, axis=1)
+        order = np.argsort(d2, axis=1, kind="stable")
+        return np.sqrt(np.take_along_axis(d2, order, axis=1)), np.take_along_axis(idx, order, axis=1)
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        """Neighbour vote share per class id (same order as self.classes)."""
+        _, idx = self.kneighbors(x, self.n_neighbors)
+        counts = np.bincount(self._y[idx], minlength=len(self.classes))
+        return counts / max(len(idx), 1)
+
+    def rank(self, x: np.ndarray) -> List[Tuple[str, float]]:
+        """All labels with their probability, most likely first."""
+        if self._n == 0:
+            return []
+        return self._ranked(self.predict_proba(x))
+
+    def rank_batch(self, X: np.ndarray) -> List[List[Tuple[str, float]]]:
+        """rank() for each row of X, with one distance computation for the whole batch."""
+        if self._n == 0:
+            return [[] for _ in range(len(X))]
+        _, idx = self.kneighbors_batch(X, self.n_neighbors)
+        votes = np.zeros((len(idx), len(self.classes)))
+        np.add.at(votes, (np.arange(len(idx))[:, None], self._y[idx]), 1)
+        return [self._ranked(v / idx.shape[1]) for v in votes]
+
+    def _ranked(self, proba: np.ndarray) -> List[Tuple[str, float]]:
+        order = np.lexsort((self._class_rank, -proba))
+        return [(self.classes[i], float(proba[i])) for i in order]
+
+    def __getstate__(self):
+        # Don't persist the unused tail of the growth buffers
+        state = self.__dict__.copy()
+        state["_X"] = self.X.copy()
+        state["_y"] = self.y.copy()
+        state["_norms"] = self._norms[:self._n].copy()
+        return state
+
+    def to_artifact(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Arrays and JSON metadata for artifact.write_artifact."""
+        arrays = {"X": self.X, "y": self.y, "norms": self._norms[:self._n]}
+        return arrays, {"n_neighbors": self.n_neighbors, "classes": list(self.classes)}
+
+    @classmethod
+    def from_artifact(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "KNNIndex":
+        """Wraps (possibly memory-mapped) artifact arrays; the first add() copies them."""
+        index = cls(n_neighbors=meta["n_neighbors"])
+        index._X, index._y, index._norms = arrays["X"], arrays["y"], arrays["norms"]
+        index._n = len(index._X)
+        index.classes = list(meta["classes"])
+        index._class_ids = {label: i for i, label in enumerate(index.classes)}
+        index._update_class_rank()
+        return index
+
+    @classmethod
+    def from_sklearn(cls, model) -> "KNNIndex":
+        """Converts a fitted KNeighborsClassifier (older pickled models)."""
+        index = cls(n_neighbors=model.n_neighbors)
+        return index.fit(model._fit_X, [str(c) for c in model.classes_[model._y]])
+
+class FastKNNIndex(KNNIndex):
+    """
+    Low-latency single-query variant of KNNIndex.
+
+    Features and norms are kept in float32, halving the memory the distance step has
+    to stream, and the matrix-vector product is written into a preallocated scratch
+    buffer instead of a fresh array. float32 rounding can reorder neighbours whose
+    distances are nearly equal; otherwise results match KNNIndex.
+    """
+
+    dtype = np.float32
+
+    def __init__(self, n_neighbors: int = 3):
+        super().__init__(n_neighbors)
+        # Distance scratch space, one per thread since predictions run in a threadpool
+        self._local = threading.local()
+
+    def _scratch(self) -> np.ndarray:
+        buf = getattr(self._local, "buf", None)
+        if buf is None or len(buf) < self._n:
+            buf = self._local.buf = np.zeros(len(self._X), dtype=np.float32)
+        return buf[:self._n]
+
+    def _sq_distances(self, x: np.ndarray) -> np.ndarray:
+        q = x.astype(np.float32)
+        d2 = self._scratch()
+        np.dot(self.X, q, out=d2)
+        d2 *= -2.0
+        d2 += self._norms[:self._n]
+        d2 += np.dot(q, q)
+        np.maximum(d2, 0.0, out=d2)
+        return d2
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
@@ -0,0 +1,59 @@
+import logging
+from typing import Dict, Mapping
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from trackpad_math.db import Drawing, LabelCount
+
+# Dialects with INSERT ... ON CONFLICT; others fall back to update-then-insert
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def add_label_counts(session: Session, deltas: Mapping[str, int]):
+    """
+    Adds deltas to the per-label drawing counts. Call it in the session that adds or
+    deletes the drawings, so the counts are committed together with them.
+    """
+    added = {label: delta for label, delta in deltas.items() if delta > 0}
+    insert = _UPSERT_INSERTS.get(session.get_bind().dialect.name)
+    if added and insert is not None:
+        # One upsert, so two sessions counting the first drawing of a label can't both insert it
+        stmt = insert(LabelCount).values([{"label": label, "count": delta} for label, delta in added.items()])
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[LabelCount.label], set_={"count": LabelCount.count + stmt.excluded["count"]}
+        ))
+    for label, delta in deltas.items():
+        if not delta or (delta > 0 and insert is not None):
+            continue
+        updated = (
+            session.query(LabelCount).filter(LabelCount.label == label)
+            .update({LabelCount.count: LabelCount.count + delta}, synchronize_session=False)
+        )
+        if not updated and delta > 0:
+            session.add(LabelCount(label=label, count=delta))
+        elif delta < 0:
+            session.query(LabelCount).filter(LabelCount.label == label, LabelCount.count <= 0).delete(
+                synchronize_session=False
+            )
+    session.flush()
+
+def get_label_counts(session: Session) -> Dict[str, int]:
+    return {r.label: r.count for r in session.query(LabelCount.label, LabelCount.count)}
+
+def clear_label_counts(session: Session):
+    session.query(LabelCount).delete(synchronize_session=False)
+
+def reconcile_label_counts(session: Session) -> int:
+    """
+    Recounts the drawings and repairs counts that drifted (e.g. rows written by an
+    older version, or an interrupted write). Returns the number of labels corrected.
+    """
+    actual = dict(session.query(Drawing.label, func.count(Drawing.id)).group_by(Drawing.label).all())
+    stored = get_label_counts(session)
+    drifted = {label for label in actual.keys() | stored.keys() if actual.get(label, 0) != stored.get(label, 0)}
+    if drifted:
+        session.query(LabelCount).filter(LabelCount.label.in_(drifted)).delete(synchronize_session=False)
+        session.add_all([LabelCount(label=label, count=actual[label]) for label in drifted if actual.get(label)])
+        session.flush()
+        logging.getLogger("app").info(f"Reconciled drawing counts of {len(drifted)} labels.")
+    return len(drifted)
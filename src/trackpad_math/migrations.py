@@ -0,0 +1,80 @@
+"""
+Schema migrations. The schema_version table records the last migration applied;
+a database created before it existed is at version 0. A new database is created
+from the current models and starts at the latest version.
+"""
+
+import json
+import logging
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from trackpad_math.db import Base, Drawing, SchemaVersion, encode_points
+
+# Drawings converted per round trip by the points migration
+CHUNK_SIZE = 1000
+
+def _pack_points(conn: Connection):
+    """Drawing.points: JSON {x, y, t} lists to packed blobs (see db.encode_points)."""
+    # The table is rebuilt since SQLite can't change a column's type. Renaming keeps
+    # its label index attached under the same name, which would clash with the new table's.
+    conn.execute(text("ALTER TABLE drawings RENAME TO drawings_json"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_drawings_label"))
+    Drawing.__table__.create(conn)
+
+    rows = conn.execute(text("SELECT id, label, timestamp, points FROM drawings_json"))
+    insert = text("INSERT INTO drawings (id, label, timestamp, points) VALUES (:id, :label, :timestamp, :points)")
+    count = 0
+    while chunk := rows.fetchmany(CHUNK_SIZE):
+        conn.execute(insert, [
+            {
+                "id": r.id,
+                "label": r.label,
+                "timestamp": r.timestamp,
+                # Drivers with a native JSON type hand it over decoded already
+                "points": encode_points(json.loads(r.points) if isinstance(r.points, str) else r.points),
+            }
+            for r in chunk
+        ])
+        count += len(chunk)
+    conn.execute(text("DROP TABLE drawings_json"))
+    logging.getLogger("app").info(f"Packed the points of {count} drawings.")
+
+def _index_timestamps(conn: Connection):
+    """Composite indexes for keyset pagination; they supersede the label index."""
+    # Tables rebuilt by _pack_points already have them
+    for index in Drawing.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    conn.execute(text("DROP INDEX IF EXISTS ix_drawings_label"))
+
+# (version, migration) in order; a migration brings the database to its version
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _pack_points),
+    (2, _index_timestamps),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def migrate(engine: Engine):
+    """Creates missing tables and applies pending migrations, all in one transaction."""
+    logger = logging.getLogger("app")
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            # pysqlite only opens a transaction before DML, so the DDL of create_all and
+            # the migrations would otherwise be autocommitted and survive a failure
+            conn.exec_driver_sql("BEGIN")
+        fresh = not inspect(conn).has_table(Drawing.__tablename__)
+        Base.metadata.create_all(bind=conn)
+        row = conn.execute(SchemaVersion.__table__.select()).first()
+        version = LATEST_VERSION if fresh else (row.version if row else 0)
+
+        for target, migration in MIGRATIONS:
+            if target > version:
+                logger.info(f"Migrating database to schema version {target}.")
+                migration(conn)
+                version = target
+
+        if row is None:
+            conn.execute(SchemaVersion.__table__.insert().values(version=version))
+        elif row.version != version:
+            conn.execute(SchemaVersion.__table__.update().values(version=version))
@@ -1,249 +1,455 @@
 import logging
 import os
 import pickle
-from typing import List, Tuple, Any, Dict, Optional, Union
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Tuple, Any, Dict, Optional, Set, Union
 import numpy as np
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.ensemble import RandomForestClassifier
-from scipy.spatial.distance import euclidean
-from fastdtw import fastdtw
-from trackpad_math.processing import extract_features, normalize, resample_drawing, segment_strokes
+from trackpad_math import artifact
+from trackpad_math.cascade import CascadeIndex
+from trackpad_math.dtw import DTWIndex
+from trackpad_math.ann import IVFIndex
+from trackpad_math.forest import PackedForest
+from trackpad_math.knn import FastKNNIndex, KNNIndex
+from trackpad_math.processing import (
+    NUM_FEATURES, PIPELINE_VERSION, DrawingLike, PointsLike, PreparedDrawing, compute_pipeline_outputs,
+    points_to_array, dtw_sequence_from_points, dtw_sequences_batch, extract_features_batch,
+    features_and_sequence_from_points, features_from_points, pack_drawings, segment_strokes_batch
+)
 
 Strokes = List[List[Dict[str, float]]]
 Points = List[Dict[str, float]]
 
+# Model types backed by a nearest-neighbour index over extract_features vectors
+KNN_MODEL_TYPES = ("knn", "fastknn", "ann")
+
+# Model class stored in the artifact of each model type
+MODEL_CLASSES = {
+    "knn": KNNIndex,
+    "fastknn": FastKNNIndex,
+    "ann": IVFIndex,
+    "rf": PackedForest,
+    "dtw": DTWIndex,
+    "cascade": CascadeIndex,
+}
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """
+    A published model state. The model in a snapshot is never modified: writers build a
+    new model (copy-on-write for single examples) and publish a new snapshot with one
+    reference assignment, so readers just grab classifier.snapshot once, without locking.
+    """
+    model: Any
+    version: int
+
 class SymbolClassifier:
-    def __init__(self, model_type: str = "knn", base_path: str = "model"):
+    def __init__(self, model_type: str = "knn", base_path: str = "model", cascade_shortlist: int = 5):
         self.model_type = model_type.lower()
+        # Number of candidate labels the "cascade" KNN stage hands to DTW
+        self.cascade_shortlist = cascade_shortlist
         self.base_path = base_path
-        self.model_path = f"{base_path}_{self.model_type}.pkl"
+        # Artifact directory; older versions pickled the model to model_<type>.pkl
+        self.model_path = f"{base_path}_{self.model_type}"
+        self.legacy_model_path = f"{base_path}_{self.model_type}.pkl"
+        # Bumped on every save; identifies the model state that produced a prediction
+        self.model_version = 0
         self.is_trained = False
-        self.model: Any = None
+        self.snapshot = ModelSnapshot(None, 0)
         self.logger = logging.getLogger("app")
+        # Serializes writers (teach, train, retrain install, load, reset); readers never take it
+        self._write_lock = threading.RLock()
+        # Examples added while a background retrain runs, as (points, label, drawing_id)
+        self._replay_log: Optional[List[Tuple[np.ndarray, str, Any]]] = None
+        # The artifact's arrays as this process last read or wrote them (header["arrays"]);
+        # reloads only checksum what changed since
+        self._verified_arrays: Dict[str, Any] = {}
         
-    def _init_model(self):
+    def _new_model(self) -> Any:
         if self.model_type == "knn":
-            self.model = KNeighborsClassifier(n_neighbors=3)
+            return KNNIndex(n_neighbors=3)
+        elif self.model_type == "fastknn":
+            # float32 brute force tuned for single-query latency
+            return FastKNNIndex(n_neighbors=3)
+        elif self.model_type == "ann":
+            # Approximate search for large template sets; tune recall/latency via model.nprobe
+            return IVFIndex(n_neighbors=3, nprobe=8)
         elif self.model_type == "rf":
-            self.model = RandomForestClassifier(n_estimators=100)
+            # Trained with sklearn, then flattened for inference (see _train_forest)
+            return PackedForest()
         elif self.model_type == "dtw":
             # DTW is lazy, "training" is just storing templates
-            self.model = {"templates": [], "labels": []}
+            return DTWIndex()
+        elif self.model_type == "cascade":
+            # KNN over features shortlists labels, DTW ranks that shortlist's templates
+            return CascadeIndex(shortlist_size=self.cascade_shortlist)
         else:
             raise ValueError(f"Unknown model type: {self.model_type}")
 
-    def train(self, drawings: List[Points], labels: List[str]):
+    @property
+    def model(self) -> Any:
+        """The currently published model."""
+        return self.snapshot.model
+
+    def _publish(self, model: Any):
+        """Makes model visible to readers as the current model_version; hold the write lock."""
+        self.snapshot = ModelSnapshot(model, self.model_version)
+
+    def train(self, drawings: List[PointsLike], labels: List[str]):
         """
-        drawings: List of flat points for each example.
+        drawings: List of flat points for each example, as {x, y, t} dicts or (N, 3) arrays.
         """
-        if self.model is None:
-            self._init_model()
-        
+        arr, offsets = pack_drawings(drawings)
         if self.model_type == "dtw":
-            self._train_dtw(drawings, labels)
+            templates, template_offsets = dtw_sequences_batch(arr, offsets)
+            self.train_arrays(labels, templates=templates, template_offsets=template_offsets)
+        elif self.model_type == "cascade":
+            features, templates, template_offsets = compute_pipeline_outputs(drawings)
+            self.train_arrays(labels, features=features, templates=templates, template_offsets=template_offsets)
         else:
-            self._train_sklearn(drawings, labels)
-            
-        self.is_trained = True
-        self.save()
+            self.train_arrays(labels, features=extract_features_batch(arr, offsets))
+
+    def train_arrays(self, labels: List[str], features: Optional[np.ndarray] = None,
+                     templates: Optional[np.ndarray] = None, template_offsets: Optional[np.ndarray] = None):
+        """
+        Train from precomputed pipeline output (e.g. the feature cache) instead of raw points.
+        features: (D, NUM_FEATURES) matrix, used by the KNN model types, "rf" and "cascade".
+        templates, template_offsets: ragged DTW sequences, used by "dtw" and "cascade".
+        """
+        # Fit a fresh model off to the side; predictions keep using the current one until the swap
+        model = self._new_model()
+        if self.model_type == "dtw":
+            model = self._train_dtw(templates, template_offsets, labels)
+        elif self.model_type == "cascade":
+            model.fit(features, templates, template_offsets, labels)
+        elif self.model_type == "rf":
+            model = self._train_forest(model, features, labels)
+        else:
+            self._train_knn(model, features, labels)
+
+        with self._write_lock:
+            self.save(model)
+            self._publish(model)
+            self.is_trained = True
 
     def reset(self):
         """Reset the model to an untrained state."""
-        self.model = None
-        self._init_model()
-        self.is_trained = False
-        if os.path.exists(self.model_path):
-            os.remove(self.model_path)
-
-    def _train_sklearn(self, drawings: List[Points], labels: List[str]):
-        X = []
-        y = []
-        for d, label in zip(drawings, labels):
-            # d is Points (List[Dict])
-            strokes = segment_strokes(d)
-            features = extract_features(strokes)
-            X.append(features)
-            y.append(label)
-        
-        if not X:
+        with self._write_lock:
+            self.is_trained = False
+            self.model_version += 1
+            self._publish(self._new_model())
+            self._replay_log = None
+            self._verified_arrays = {}
+            artifact.remove_artifact(self.model_path)
+            if os.path.exists(self.legacy_model_path):
+                os.remove(self.legacy_model_path)
+
+    def _train_knn(self, model: Any, X: np.ndarray, labels: List[str]):
+        if len(X) == 0:
             print("No data to train.")
             return
 
-        X = np.array(X)
-        self.model.fit(X, y)
-
-    def _train_dtw(self, drawings: List[Points], labels: List[str]):
-        # specific preprocessing for DTW: normalize + resample -> keep as sequence of points
-        templates = []
-        for d in drawings:
-            # d is Points (List[Dict])
-            strokes = segment_strokes(d)
-            norm_strokes = normalize(strokes)
-            resampled = resample_drawing(norm_strokes, points_per_stroke=20)
-            
-            # Flatten to (N, 2) array for fastdtw
-            points = []
-            for stroke in resampled:
-                for p in stroke:
-                    points.append([p['x'], p['y']])
-            
-            if not points:
-                points = [[0.0, 0.0]] # dummy
-            
-            templates.append(np.array(points))
-            
-        self.model = {
-            "templates": templates,
-            "labels": labels
-        }
-
-    def predict(self, points: Points) -> List[Tuple[str, float]]:
+        model.fit(X, list(labels))
+
+    def _train_forest(self, model: PackedForest, X: np.ndarray, labels: List[str]) -> PackedForest:
+        if len(X) == 0:
+            print("No data to train.")
+            return model
+
+        # sklearn is only needed to grow the trees, not to load or run them
+        from sklearn.ensemble import RandomForestClassifier
+        forest = RandomForestClassifier(n_estimators=100).fit(X, list(labels))
+        return PackedForest.from_sklearn(forest)
+
+    def _train_dtw(self, templates: np.ndarray, template_offsets: np.ndarray, labels: List[str]) -> DTWIndex:
+        # Templates are normalized + resampled (N, 2) sequences, packed into one padded array
+        return DTWIndex.from_ragged(templates, template_offsets, labels)
+
+    def predict(self, points: PointsLike) -> List[Tuple[str, float]]:
+        return self.predict_versioned(points)[0]
+
+    def predict_versioned(self, points: PointsLike) -> Tuple[List[Tuple[str, float]], int]:
+        """predict(), plus the version of the model snapshot that produced the result."""
         if not self.is_trained:
             # Try loading
             if not self.load():
-                if self.model is None:
-                    self._init_model()
-                return [("Uninitialized", 0.0)]
-        
-        if self.model is None:
-            self._init_model()
+                return [("Uninitialized", 0.0)], self.snapshot.version
+
+        # Everything below uses this one snapshot, whatever writers publish meanwhile
+        snapshot = self.snapshot
+        model = snapshot.model
+        if model is None:
+            return [("Uninitialized", 0.0)], snapshot.version
 
         if self.model_type == "dtw":
-            return self._predict_dtw(points)
+            predictions = self._predict_dtw(model, points)
+        elif self.model_type == "cascade":
+            predictions = self._predict_cascade(model, points)
+        elif self.model_type in KNN_MODEL_TYPES:
+            predictions = self._predict_knn(model, points)
         else:
-            return self._predict_sklearn(points)
+            predictions = self._predict_forest(model, points)
+        return predictions, snapshot.version
 
-    def _predict_sklearn(self, points: Points) -> List[Tuple[str, float]]:
-        strokes = segment_strokes(points)
-        features = extract_features(strokes).reshape(1, -1)
-        probs = self.model.predict_proba(features)[0]
-        classes = self.model.classes_
-        
-        results = []
-        for i, label in enumerate(classes):
-            results.append((label, probs[i]))
-            
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results
-
-    def _predict_dtw(self, points: Points) -> List[Tuple[str, float]]:
-        # Preprocess input same as training
-        strokes = segment_strokes(points)
-        norm_strokes = normalize(strokes)
-        resampled = resample_drawing(norm_strokes, points_per_stroke=20)
-        
-        input_points = []
-        for stroke in resampled:
-            for p in stroke:
-                input_points.append([p['x'], p['y']])
-        input_arr = np.array(input_points)
-        
-        if len(input_arr) == 0:
+    def predict_batch(self, drawings: List[DrawingLike]) -> Tuple[List[List[Tuple[str, float]]], int]:
+        """
+        predict_versioned() for many drawings, all answered by the same snapshot. The
+        raw drawings of the batch share one pass through the processing pipeline, while
+        PreparedDrawing items skip it. KNN and forest models also score the batch with
+        one distance computation / tree walk (see rank_batch).
+        """
+        if not self.is_trained:
+            if not self.load():
+                return [[("Uninitialized", 0.0)] for _ in drawings], self.snapshot.version
+
+        snapshot = self.snapshot
+        model = snapshot.model
+        if model is None:
+            return [[("Uninitialized", 0.0)] for _ in drawings], snapshot.version
+        if not drawings:
+            return [], snapshot.version
+
+        uses_features = self.model_type != "dtw"
+        uses_sequences = self.model_type in ("dtw", "cascade")
+        features = np.zeros((len(drawings), NUM_FEATURES), dtype=np.float64)
+        sequences: List[Optional[np.ndarray]] = [None] * len(drawings)
+        sizes = np.zeros(len(drawings), dtype=np.int64)
+
+        raw = [i for i, d in enumerate(drawings) if not isinstance(d, PreparedDrawing)]
+        if raw:
+            arr, offsets = pack_drawings([drawings[i] for i in raw])
+            strokes = segment_strokes_batch(arr, offsets)
+            sizes[raw] = np.diff(offsets)
+            if uses_features:
+                features[raw] = extract_features_batch(arr, offsets, strokes)
+            if uses_sequences:
+                seqs, seq_offsets = dtw_sequences_batch(arr, offsets, strokes)
+                for j, i in enumerate(raw):
+                    sequences[i] = seqs[seq_offsets[j]:seq_offsets[j + 1]]
+        for i, d in enumerate(drawings):
+            if isinstance(d, PreparedDrawing):
+                features[i], sequences[i], sizes[i] = d.features, d.sequence, d.num_points
+
+        if not uses_sequences:
+            return model.rank_batch(features), snapshot.version
+        predictions = []
+        for i in range(len(drawings)):
+            if sizes[i] == 0:
+                predictions.append([("Empty", 0.0)])
+                continue
+            seq = sequences[i]
+            if self.model_type == "dtw":
+                matches, _ = model.query(seq, k=5)
+            else:
+                matches, _ = model.query(features[i], seq, k=5)
+            predictions.append([(label, 1.0 / (1.0 + dist)) for label, dist in matches])
+        return predictions, snapshot.version
+
+    def predict_fast(self, points: DrawingLike) -> Optional[Tuple[List[Tuple[str, float]], int]]:
+        """
+        A cheap, possibly less accurate predict_versioned() for when the inference queue
+        is full: the cascade answers from its KNN stage alone. None for the other model
+        types, which have no cheaper model than the full one, or an unloaded model.
+        """
+        snapshot = self.snapshot
+        model = snapshot.model
+        if self.model_type != "cascade" or model is None or not self.is_trained:
+            return None
+        if isinstance(points, PreparedDrawing):
+            features = points.features
+        else:
+            features = features_from_points(points)
+        return model.knn.rank(features), snapshot.version
+
+    def _predict_knn(self, model: Any, points: PointsLike) -> List[Tuple[str, float]]:
+        return model.rank(features_from_points(points))
+
+    def _predict_forest(self, model: PackedForest, points: PointsLike) -> List[Tuple[str, float]]:
+        return model.rank(features_from_points(points))
+
+    def _predict_dtw(self, model: DTWIndex, points: PointsLike) -> List[Tuple[str, float]]:
+        if len(points) == 0:
              return [("Empty", 0.0)]
 
-        # Compare against all templates
-        templates = self.model["templates"]
-        labels = self.model["labels"]
-        
-        distances = []
-        
-        for i, templ in enumerate(templates):
-            dist, path = fastdtw(input_arr, templ, dist=euclidean)
-            distances.append((labels[i], dist))
-            
-        # We need to aggregate dists by label (1-NN or k-NN)
-        # 1-NN strategy: Find the single closest template
-        distances.sort(key=lambda x: x[1])
-        
+        # Preprocess input same as training
+        input_arr = dtw_sequence_from_points(points)
+
+        # Closest distinct labels; the index prunes templates that can't make the top 5
+        matches, _ = model.query(input_arr, k=5)
+
         # Convert distance to a "confidence" score?
         # Distance 0 -> Conf 1. Large dist -> Conf 0.
-        # This is arbitrary. For now, let's just return the sorted list of labels
-        # and use 1.0 / (1.0 + dist) as pseudo-conf
-        
-        best_label, best_dist = distances[0]
-        
-        # Aggregate unique labels slightly for display
-        # We'll just return the top K matches
-        results = []
-        seen_labels = set()
-        for label, dist in distances:
-            if label not in seen_labels:
-                score = 1.0 / (1.0 + dist)
-                results.append((label, score))
-                seen_labels.add(label)
-                if len(results) >= 5:
-                    break
-        
-        return results
+        # This is arbitrary. For now, use 1.0 / (1.0 + dist) as pseudo-conf
+        return [(label, 1.0 / (1.0 + dist)) for label, dist in matches]
+
+    def _predict_cascade(self, model: CascadeIndex, points: PointsLike) -> List[Tuple[str, float]]:
+        if len(points) == 0:
+             return [("Empty", 0.0)]
+
+        start = time.perf_counter()
+        features, seq = features_and_sequence_from_points(points)
+        preprocess_ms = (time.perf_counter() - start) * 1000
 
-    def add_example(self, points: Points, label: str):
+        matches, timings = model.query(features, seq, k=5)
+        self.logger.debug(
+            f"Cascade timings: preprocess {preprocess_ms:.2f}ms, "
+            f"shortlist {timings.get('shortlist_ms', 0.0):.2f}ms, "
+            f"dtw {timings.get('dtw_ms', 0.0):.2f}ms over {timings.get('dtw_templates', 0)} templates"
+        )
+        # Same pseudo-confidence as the plain DTW model
+        return [(label, 1.0 / (1.0 + dist)) for label, dist in matches]
+
+    def add_example(self, points: PointsLike, label: str, drawing_id: Any = None):
         """
         Increment incrementally update the model with a new example.
         Only supported for clean 'instance-based' models like KNN and DTW.
+        drawing_id identifies the stored drawing, so a running background retrain
+        can tell whether its training set already contains the example.
         """
-        if self.model is None:
-            self._init_model()
-
-        if self.model_type == "rf":
-            print("Warning: Random Forest does not support incremental updates. Training required.")
-            return
+        with self._write_lock:
+            if self.model_type == "rf":
+                print("Warning: Random Forest does not support incremental updates. Training required.")
+                return
 
-        strokes = segment_strokes(points)
+            # Copy-on-write: the published model stays intact for predictions in flight
+            model = self._with_example(self.model if self.model is not None else self._new_model(), points, label)
+            if self._replay_log is not None:
+                self._replay_log.append((points_to_array(points), label, drawing_id))
+            self._save_appended(model)
+            self._publish(model)
+            if self.model_type != "dtw":
+                self.is_trained = True
 
+    def _with_example(self, model: Any, points: PointsLike, label: str) -> Any:
         if self.model_type == "dtw":
             # Just append to templates
-            norm_strokes = normalize(strokes)
-            resampled = resample_drawing(norm_strokes, points_per_stroke=20)
-            p_arr = []
-            for stroke in resampled:
-                for p in stroke:
-                    p_arr.append([p['x'], p['y']])
-            if not p_arr: 
-                p_arr = [[0.0, 0.0]]
-            
-            self.model["templates"].append(np.array(p_arr))
-            self.model["labels"].append(label)
-            self.save()
-            return
-            
-        if self.model_type == "knn":
-            # For KNN, we need to add to the existing training set.
-            # Sklearn's KNN stores data in _fit_X and encoded labels in _y.
-            new_features = extract_features(strokes).reshape(1, -1)
-            
-            if hasattr(self.model, "_fit_X") and self.model._fit_X is not None and hasattr(self.model, "_y"):
-                X = np.vstack([self.model._fit_X, new_features])
-                
-                # Decode existing labels
-                # self.model._y are indices into self.model.classes_
-                if hasattr(self.model, "classes_"):
-                    decoded_y = self.model.classes_[self.model._y]
-                    y = np.append(decoded_y, label)
-                else:
-                    # Fallback if classes_ missing (shouldn't happen for trained model)
-                    y = np.append(self.model._y, label)
-            else:
-                # First example?
-                X = new_features
-                y = np.array([label])
-            
-            self.model.fit(X, y)
+            return model.with_example(dtw_sequence_from_points(points), label)
+        elif self.model_type == "cascade":
+            features, seq = features_and_sequence_from_points(points)
+            return model.with_example(features, seq, label)
+        else:
+            # Appends to the index's growth buffers; no refit of the existing examples
+            return model.with_example(features_from_points(points), label)
+
+    def start_replay_log(self):
+        """Starts recording added examples, for replay into a model being retrained elsewhere."""
+        with self._write_lock:
+            self._replay_log = []
+
+    def discard_replay_log(self):
+        with self._write_lock:
+            self._replay_log = None
+
+    def install_model(self, model: Any, trained_ids: Set[Any]) -> int:
+        """
+        Swaps in a model trained in the background and saves it. Examples added since
+        start_replay_log() whose drawing isn't in trained_ids are replayed into it first,
+        so nothing taught during the retrain is lost. Returns the number replayed.
+        """
+        with self._write_lock:
+            replay = [e for e in self._replay_log or [] if e[2] is None or e[2] not in trained_ids]
+            for points, label, _ in replay:
+                model = self._with_example(model, points, label)
+            self._replay_log = None
+            self.save(model)
+            self._publish(model)
             self.is_trained = True
-            self.save()
+            return len(replay)
+
+    def save(self, model: Any = None):
+        """Writes model (default: the published one) as a new artifact version (see trackpad_math.artifact)."""
+        model = self.model if model is None else model
+        arrays, meta = model.to_artifact()
+        header = artifact.write_artifact(self.model_path, self.model_type, self.model_version + 1, PIPELINE_VERSION, arrays, meta)
+        self._verified_arrays = header["arrays"]
+        self.model_version += 1
 
-    def save(self):
-        with open(self.model_path, 'wb') as f:
-            pickle.dump(self.model, f)
-            
-    def load(self) -> bool:
+    def _save_appended(self, model: Any):
+        """Persists a model that just had an example added, writing only the new rows if possible."""
+        if model.appendable:
+            arrays, meta = model.to_artifact()
+            try:
+                header = artifact.append_rows(self.model_path, self.model_version + 1, arrays, meta)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Could not append to model artifact, rewriting it: {e}")
+                header = None
+            if header is not None:
+                self._verified_arrays = header["arrays"]
+                self.model_version = header["model_version"]
+                return
+        self.save(model)
+
+    def load(self, mmap: bool = True) -> bool:
+        """
+        Loads the saved model. With mmap the artifact's arrays stay memory-mapped and
+        nothing but the JSON header is deserialized; otherwise they are read into memory.
+        Arrays are checksummed in full only the first time; reloads check appended rows.
+        """
         self.logger.debug(f"Loading model from {self.model_path}")
-        if os.path.exists(self.model_path):
-            with open(self.model_path, 'rb') as f:
-                self.model = pickle.load(f)
-            self.is_trained = True
-            return True
-        return False
-    
+        if not os.path.isdir(self.model_path):
+            return self._load_legacy()
+
+        try:
+            header, arrays = artifact.read_artifact(
+                self.model_path, mmap_mode="r" if mmap else None, verified=self._verified_arrays
+            )
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Could not load model artifact: {e}")
+            return False
+        if header["model_type"] != self.model_type:
+            self.logger.warning(f"Model artifact holds a {header['model_type']} model, expected {self.model_type}")
+            return False
+        if header["pipeline_version"] != PIPELINE_VERSION:
+            self.logger.info("Model artifact was built by an older processing pipeline; retraining required.")
+            return False
+
+        model = MODEL_CLASSES[self.model_type].from_artifact(arrays, header["meta"])
+        with self._write_lock:
+            if header["model_version"] < self.model_version:
+                # A writer published a newer model while this one was being read
+                return True
+            self._verified_arrays = header["arrays"]
+            self.model_version = header["model_version"]
+            self._loaded(model)
+        return True
+
+    def _load_legacy(self) -> bool:
+        """Loads and converts a model pickled by older versions, replacing it with an artifact."""
+        if not os.path.exists(self.legacy_model_path):
+            return False
+        with open(self.legacy_model_path, 'rb') as f:
+            model = pickle.load(f)
+        if isinstance(model, dict):
+            # Older DTW models stored a plain dict of template lists
+            model = DTWIndex.from_templates(model["templates"], model["labels"])
+        elif not isinstance(model, tuple(MODEL_CLASSES.values())):
+            model = self._convert_sklearn_model(model)
+
+        self.logger.info(f"Converting {self.legacy_model_path} to a model artifact.")
+        with self._write_lock:
+            self.save(model)
+            self._loaded(model)
+        os.remove(self.legacy_model_path)
+        return True
+
+    def _loaded(self, model: Any):
+        if isinstance(model, CascadeIndex):
+            # The configured shortlist size wins over the one saved with the model
+            model.shortlist_size = self.cascade_shortlist
+        self._publish(model)
+        self.is_trained = True
+
+    def _convert_sklearn_model(self, model: Any) -> Any:
+        """Older KNN and RF models pickled the sklearn estimator itself."""
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.neighbors import KNeighborsClassifier
+        if isinstance(model, KNeighborsClassifier):
+            return KNNIndex.from_sklearn(model)
+        if isinstance(model, RandomForestClassifier):
+            return PackedForest.from_sklearn(model)
+        return model
+
     def warmup(self):
         self.logger.debug("Warming up model.")
         _ = self.predict([{"x": 0, "y": 0, "t": 0}])
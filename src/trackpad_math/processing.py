@@ -1,52 +1,366 @@
+import hashlib
+import json
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence, Tuple, Union
 
-def normalize(strokes: List[List[Dict[str, float]]]) -> List[List[Dict[str, float]]]:
+# Pipeline parameters shared by training and inference.
+POINTS_PER_STROKE = 20
+MAX_STROKES = 8
+# A new stroke starts when the gap between two points exceeds
+# max(STROKE_GAP_MEDIAN_FACTOR * median gap, STROKE_GAP_MIN_MS).
+STROKE_GAP_MEDIAN_FACTOR = 10
+STROKE_GAP_MIN_MS = 150
+NUM_FEATURES = MAX_STROKES * POINTS_PER_STROKE * 2 + 2
+# Bump when the pipeline changes in a way the parameters above don't capture.
+PIPELINE_REVISION = 1
+
+def pipeline_version() -> str:
+    """
+    Short hash of everything that affects the features/templates computed from a drawing.
+    Cached features tagged with a different version are stale.
+    """
+    params = {
+        "revision": PIPELINE_REVISION,
+        "points_per_stroke": POINTS_PER_STROKE,
+        "max_strokes": MAX_STROKES,
+        "stroke_gap_median_factor": STROKE_GAP_MEDIAN_FACTOR,
+        "stroke_gap_min_ms": STROKE_GAP_MIN_MS,
+    }
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+PIPELINE_VERSION = pipeline_version()
+
+Points = List[Dict[str, float]]
+Strokes = List[List[Dict[str, float]]]
+PointsLike = Union[Points, np.ndarray]
+
+class PreparedDrawing(NamedTuple):
+    """Pipeline output for one drawing, computed ahead of classification (see DrawingBuffer)."""
+    features: np.ndarray
+    sequence: np.ndarray
+    num_points: int
+
+# A drawing to classify: raw points, or its precomputed pipeline output
+DrawingLike = Union[PointsLike, PreparedDrawing]
+
+# --- Array API ---
+#
+# A drawing is a contiguous float64 array of shape (N, 3) with columns x, y, t,
+# plus an int64 "offsets" array of shape (S + 1,) where stroke i spans
+# rows offsets[i]:offsets[i + 1].
+
+def points_to_array(points: PointsLike) -> np.ndarray:
+    """
+    Converts a flat list of {x, y, t} dicts (or an existing array) to an (N, 3) float64 array.
+    """
+    if isinstance(points, np.ndarray):
+        arr = np.ascontiguousarray(points, dtype=np.float64)
+        return arr.reshape(-1, 3)
+    if not points:
+        return np.empty((0, 3), dtype=np.float64)
+    return np.array([(p['x'], p['y'], p['t']) for p in points], dtype=np.float64)
+
+def array_to_points(arr: np.ndarray) -> Points:
+    """
+    Converts an (N, 3) array back to a list of {x, y, t} dicts.
+    """
+    return [{"x": x, "y": y, "t": t} for x, y, t in arr.tolist()]
+
+def strokes_to_array(strokes: Strokes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Packs a list of dict strokes into one (N, 3) array plus stroke offsets.
+    """
+    lengths = [len(s) for s in strokes]
+    offsets = np.zeros(len(strokes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    arr = points_to_array([p for stroke in strokes for p in stroke])
+    return arr, offsets
+
+def array_to_strokes(arr: np.ndarray, offsets: np.ndarray) -> Strokes:
+    """
+    Unpacks an (N, 3) array plus stroke offsets into a list of dict strokes.
+    """
+    points = array_to_points(arr)
+    return [points[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+def pack_drawings(drawings: Sequence[PointsLike]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Packs many drawings into one ragged (M, 3) array plus drawing offsets of shape (D + 1,),
+    where drawing i spans rows drawing_offsets[i]:drawing_offsets[i + 1].
+    """
+    parts = [points_to_array(d) for d in drawings]
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in parts], out=offsets[1:])
+    arr = np.concatenate(parts) if parts else np.empty((0, 3), dtype=np.float64)
+    return arr, offsets
+
+def _owner(offsets: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Index of the segment of offsets that each row position falls in (empty segments are skipped)."""
+    return np.searchsorted(offsets, positions, side="right") - 1
+
+def _segment_bounds(arr: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-segment (x, y) minimum and maximum, plus the mask of non-empty segments."""
+    nonempty = offsets[1:] > offsets[:-1]
+    mins = np.zeros((len(offsets) - 1, 2), dtype=np.float64)
+    maxs = np.zeros((len(offsets) - 1, 2), dtype=np.float64)
+    if nonempty.any():
+        starts = offsets[:-1][nonempty]
+        mins[nonempty] = np.minimum.reduceat(arr[:, :2], starts, axis=0)
+        maxs[nonempty] = np.maximum.reduceat(arr[:, :2], starts, axis=0)
+    return mins, maxs, nonempty
+
+def segment_strokes_batch(arr: np.ndarray, drawing_offsets: np.ndarray) -> np.ndarray:
+    """
+    Segments every drawing of a packed batch into strokes based on time difference.
+    Returns global stroke offsets; strokes never cross drawing boundaries.
+    """
+    sizes = np.diff(drawing_offsets)
+    num_drawings = len(sizes)
+
+    # Time gaps inside each drawing (the gap across a drawing boundary is dropped)
+    deltas = np.diff(arr[:, 2])
+    inside = np.ones(len(deltas), dtype=bool)
+    bounds = drawing_offsets[1:-1]
+    inside[bounds[(bounds > 0) & (bounds < len(arr))] - 1] = False
+    gap_idx = np.flatnonzero(inside)
+    gap_owner = _owner(drawing_offsets, gap_idx)
+
+    # Per-drawing median gap: sort gaps within each drawing and pick the middle pair
+    order = np.lexsort((deltas[gap_idx], gap_owner))
+    sorted_gaps = deltas[gap_idx][order]
+    counts = np.maximum(sizes - 1, 0)
+    first = np.zeros(num_drawings, dtype=np.int64)
+    np.cumsum(counts[:-1], out=first[1:])
+    has_gaps = counts > 0
+    median = np.zeros(num_drawings, dtype=np.float64)
+    lo = first[has_gaps] + (counts[has_gaps] - 1) // 2
+    hi = first[has_gaps] + counts[has_gaps] // 2
+    median[has_gaps] = (sorted_gaps[lo] + sorted_gaps[hi]) / 2
+
+    threshold = np.maximum(median * STROKE_GAP_MEDIAN_FACTOR, STROKE_GAP_MIN_MS)
+    breaks = gap_idx[deltas[gap_idx] > threshold[gap_owner]] + 1
+
+    starts = drawing_offsets[:-1][sizes > 0]
+    return np.concatenate((np.sort(np.concatenate((starts, breaks))), [len(arr)])).astype(np.int64)
+
+def segment_strokes_array(arr: np.ndarray) -> np.ndarray:
+    """
+    Returns stroke offsets for a flat (N, 3) drawing, splitting on time gaps.
+    """
+    return segment_strokes_batch(arr, np.array([0, len(arr)], dtype=np.int64))
+
+def normalize_batch(arr: np.ndarray, drawing_offsets: np.ndarray) -> np.ndarray:
+    """
+    Normalizes every drawing of a packed batch independently (see normalize_array).
+    """
+    out = np.array(arr, dtype=np.float64)
+    if len(out) == 0:
+        return out
+
+    mins, maxs, _ = _segment_bounds(out, drawing_offsets)
+    size = maxs - mins
+
+    # Avoid division by zero
+    scale = 1.0 / np.maximum(np.maximum(size[:, 0], size[:, 1]), 1e-6)
+    center = (mins + maxs) / 2.0
+
+    sizes = np.diff(drawing_offsets)
+    xy = out[:, :2]
+    xy -= np.repeat(center, sizes, axis=0)
+    xy *= np.repeat(scale, sizes)[:, None]
+    return out
+
+def normalize_array(arr: np.ndarray) -> np.ndarray:
+    """
+    Returns a copy of the drawing centered at 0,0 and scaled into [-0.5, 0.5],
+    preserving aspect ratio. The t column is left untouched.
+    """
+    return normalize_batch(arr, np.array([0, len(arr)], dtype=np.int64))
+
+def resample_strokes_array(arr: np.ndarray, offsets: np.ndarray, n: int = POINTS_PER_STROKE) -> np.ndarray:
+    """
+    Resamples every stroke to exactly n points using linear interpolation along
+    path length. Returns an array of shape (S, n, 3).
+
+    All strokes are handled in one pass: path length is accumulated over the whole
+    array with the jumps between strokes zeroed out, so each stroke owns a
+    contiguous, non-decreasing slice of the cumulative distance. This works the
+    same for one drawing or for a packed batch of drawings.
+    """
+    starts = offsets[:-1]
+    last = offsets[1:] - 1
+    num_strokes = len(starts)
+    if num_strokes == 0:
+        return np.zeros((0, n, 3), dtype=np.float64)
+
+    seg = np.sqrt(np.sum(np.diff(arr[:, :2], axis=0) ** 2, axis=1))
+    seg[last[:-1]] = 0.0
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+
+    base = cum[starts]
+    total = cum[last] - base
+    targets = base[:, None] + np.linspace(0.0, 1.0, n)[None, :] * total[:, None]
+
+    # Left neighbour of each target, kept inside its own stroke
+    j = np.searchsorted(cum, targets, side="right") - 1
+    j = np.clip(j, starts[:, None], last[:, None])
+    nxt = np.minimum(j + 1, last[:, None])
+
+    span = cum[nxt] - cum[j]
+    safe_span = np.where(span > 0, span, 1.0)
+    frac = np.where(span > 0, (targets - cum[j]) / safe_span, 0.0)
+    out = arr[j] + frac[..., None] * (arr[nxt] - arr[j])
+
+    # Single points and zero-length strokes repeat their first point
+    flat = total <= 0
+    if flat.any():
+        out[flat] = arr[starts[flat]][:, None, :]
+    return out
+
+def extract_features_batch(arr: np.ndarray, drawing_offsets: np.ndarray,
+                           stroke_offsets: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Feature matrix of shape (D, NUM_FEATURES) for a packed batch of drawings.
+    Each row holds the normalized, resampled (x, y) points of the first MAX_STROKES
+    strokes (zero padded), followed by the stroke count and the aspect ratio.
+
+    stroke_offsets may be passed when the batch is already segmented.
+    """
+    num_drawings = len(drawing_offsets) - 1
+    features = np.zeros((num_drawings, NUM_FEATURES), dtype=np.float64)
+    if num_drawings == 0:
+        return features
+    if stroke_offsets is None:
+        stroke_offsets = segment_strokes_batch(arr, drawing_offsets)
+
+    # Calculate aspect ratio before normalization
+    mins, maxs, _ = _segment_bounds(arr, drawing_offsets)
+    width, height = (maxs - mins).T
+    safe_height = np.where(height > 0, height, 1.0)
+    aspect_ratio = np.where(height > 0, width / safe_height, 0.0)
+
+    # Rank of each stroke inside its drawing; only the first MAX_STROKES are kept
+    stroke_owner = _owner(drawing_offsets, stroke_offsets[:-1])
+    num_strokes = np.bincount(stroke_owner, minlength=num_drawings)
+    first_stroke = np.concatenate(([0], np.cumsum(num_strokes)[:-1]))
+    rank = np.arange(len(stroke_owner)) - first_stroke[stroke_owner]
+    keep = rank < MAX_STROKES
+
+    if keep.any():
+        resampled = resample_strokes_array(normalize_batch(arr, drawing_offsets), stroke_offsets, POINTS_PER_STROKE)
+        body = features[:, :MAX_STROKES * POINTS_PER_STROKE * 2].reshape(num_drawings, MAX_STROKES, -1)
+        body[stroke_owner[keep], rank[keep]] = resampled[keep, :, :2].reshape(int(keep.sum()), -1)
+
+    features[:, -2] = num_strokes
+    features[:, -1] = aspect_ratio
+    return features
+
+def extract_features_array(arr: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Array version of extract_features. Returns a vector of length NUM_FEATURES.
+    """
+    return extract_features_batch(arr, np.array([0, len(arr)], dtype=np.int64), offsets)[0]
+
+def dtw_sequences_batch(arr: np.ndarray, drawing_offsets: np.ndarray,
+                        stroke_offsets: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    DTW representation of a packed batch: the normalized, resampled (x, y) sequence
+    of all strokes of each drawing. Returns a ragged (K, 2) array plus sequence
+    offsets of shape (D + 1,). Empty drawings get a single dummy (0, 0) point.
+    """
+    num_drawings = len(drawing_offsets) - 1
+    if stroke_offsets is None:
+        stroke_offsets = segment_strokes_batch(arr, drawing_offsets)
+
+    stroke_owner = _owner(drawing_offsets, stroke_offsets[:-1])
+    num_strokes = np.bincount(stroke_owner, minlength=num_drawings)
+    lengths = np.where(num_strokes > 0, num_strokes * POINTS_PER_STROKE, 1)
+    seq_offsets = np.zeros(num_drawings + 1, dtype=np.int64)
+    np.cumsum(lengths, out=seq_offsets[1:])
+
+    seqs = np.zeros((seq_offsets[-1], 2), dtype=np.float64)
+    if len(stroke_owner):
+        resampled = resample_strokes_array(normalize_batch(arr, drawing_offsets), stroke_offsets, POINTS_PER_STROKE)
+        # Strokes of non-empty drawings are contiguous in both layouts
+        filled = np.repeat(num_strokes > 0, lengths)
+        seqs[filled] = resampled[:, :, :2].reshape(-1, 2)
+    return seqs, seq_offsets
+
+def dtw_sequence_array(arr: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Normalized, resampled (x, y) sequence of all strokes concatenated, shape (S * n, 2).
+    Used as the DTW representation of a drawing.
+    """
+    seqs, _ = dtw_sequences_batch(arr, np.array([0, len(arr)], dtype=np.int64), offsets)
+    return seqs
+
+def compute_pipeline_outputs(drawings: Sequence[PointsLike]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Features and DTW templates for many drawings, sharing one packing and segmentation pass."""
+    arr, offsets = pack_drawings(drawings)
+    strokes = segment_strokes_batch(arr, offsets)
+    features = extract_features_batch(arr, offsets, strokes)
+    templates, template_offsets = dtw_sequences_batch(arr, offsets, strokes)
+    return features, templates, template_offsets
+
+def features_from_points(points: PointsLike) -> np.ndarray:
+    """
+    Raw points (dicts or (N, 3) array) straight to the feature vector.
+    """
+    arr = points_to_array(points)
+    return extract_features_array(arr, segment_strokes_array(arr))
+
+def dtw_sequence_from_points(points: PointsLike) -> np.ndarray:
+    """
+    Raw points (dicts or (N, 3) array) straight to the DTW sequence.
+    """
+    arr = points_to_array(points)
+    return dtw_sequence_array(arr, segment_strokes_array(arr))
+
+def features_and_sequence_from_points(points: PointsLike) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Raw points to both the feature vector and the DTW sequence, segmenting once.
+    """
+    arr = points_to_array(points)
+    offsets = segment_strokes_array(arr)
+    return extract_features_array(arr, offsets), dtw_sequence_array(arr, offsets)
+
+def features_from_resampled(resampled: np.ndarray, mins: np.ndarray, maxs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Feature vector and DTW sequence of one drawing from its strokes resampled in raw
+    coordinates ((S, n, 3), see resample_strokes_array) and its raw (x, y) bounds.
+
+    Normalization is a uniform scale plus a shift, so it commutes with resampling along
+    path length: this matches extract_features_array / dtw_sequence_array up to float
+    rounding, while letting a caller keep each stroke resampled as soon as it is complete.
+    """
+    size = maxs - mins
+    scale = 1.0 / max(size[0], size[1], 1e-6)
+    xy = (resampled[:, :, :2] - (mins + maxs) / 2.0) * scale
+
+    features = np.zeros(NUM_FEATURES, dtype=np.float64)
+    kept = xy[:MAX_STROKES].reshape(-1)
+    features[:len(kept)] = kept
+    features[-2] = len(resampled)
+    features[-1] = size[0] / size[1] if size[1] > 0 else 0.0
+    # Like dtw_sequences_batch, an empty drawing gets a single dummy point
+    sequence = xy.reshape(-1, 2) if len(xy) else np.zeros((1, 2), dtype=np.float64)
+    return features, sequence
+
+# --- Dict API (compatibility shims over the array API) ---
+
+def normalize(strokes: Strokes) -> Strokes:
     """
     Centers the drawing at 0,0 and scales it to fit within a unit square [-0.5, 0.5],
     preserving aspect ratio.
     """
     if not strokes:
         return []
-
-    # Collect all points
-    all_points = []
-    for stroke in strokes:
-        for p in stroke:
-            all_points.append([p['x'], p['y']])
-    
-    if not all_points:
+    arr, offsets = strokes_to_array(strokes)
+    if len(arr) == 0:
         return strokes
+    return array_to_strokes(normalize_array(arr), offsets)
 
-    arr = np.array(all_points)
-    min_vals = np.min(arr, axis=0)
-    max_vals = np.max(arr, axis=0)
-    
-    # Calculate dimensions
-    width = max_vals[0] - min_vals[0]
-    height = max_vals[1] - min_vals[1]
-    
-    # Avoid division by zero
-    scale = 1.0 / max(width, height, 1e-6)
-    
-    # Center translation
-    center_x = (min_vals[0] + max_vals[0]) / 2.0
-    center_y = (min_vals[1] + max_vals[1]) / 2.0
-    
-    new_strokes = []
-    for stroke in strokes:
-        new_stroke = []
-        for p in stroke:
-            new_stroke.append({
-                "x": (p['x'] - center_x) * scale,
-                "y": (p['y'] - center_y) * scale,
-                "t": p['t'] # Keep time relative or original? Usually relative is enough, but we leave it.
-            })
-        new_strokes.append(new_stroke)
-        
-    return new_strokes
-
-def flatten_drawing(strokes: List[List[Dict[str, float]]]) -> np.ndarray:
+def flatten_drawing(strokes: Strokes) -> np.ndarray:
     """
     Flattens a drawing into a single numpy array of shape (N, 3) where columns are x, y, t.
     Useful for DTW. Stroke breaks are implicit in the large jumps in x/y or just concatenated.
@@ -54,144 +368,45 @@ def flatten_drawing(strokes: List[List[Dict[str, float]]]) -> np.ndarray:
     Here we'll just concatenate for simplicity in baseline.
     Warning: Connecting end of stroke 1 to start of stroke 2 might create artifacts.
     """
-    points = []
-    for stroke in strokes:
-        for p in stroke:
-            points.append([p['x'], p['y'], p['t']])
-    return np.array(points)
+    arr, _ = strokes_to_array(strokes)
+    return arr
 
-def resample_stroke(stroke: List[Dict[str, float]], n: int = 20) -> List[Dict[str, float]]:
+def resample_stroke(stroke: Points, n: int = POINTS_PER_STROKE) -> Points:
     """
     Resamples a stroke to have exactly n points using linear interpolation along path length.
     """
     if not stroke:
         return []
-    if len(stroke) == 1:
-        return [stroke[0]] * n
-
-    # Extract arrays
-    x = np.array([p['x'] for p in stroke])
-    y = np.array([p['y'] for p in stroke])
-    t = np.array([p['t'] for p in stroke])
-    
-    # Calculate cumulative distance
-    dists = np.sqrt(np.diff(x)**2 + np.diff(y)**2)
-    cum_dist = np.concatenate(([0], np.cumsum(dists)))
-    total_dist = cum_dist[-1]
-    
-    if total_dist == 0:
-        return [stroke[0]] * n
-
-    # Interact points
-    new_dists = np.linspace(0, total_dist, n)
-    new_x = np.interp(new_dists, cum_dist, x)
-    new_y = np.interp(new_dists, cum_dist, y)
-    new_t = np.interp(new_dists, cum_dist, t)
-    
-    res = []
-    for i in range(n):
-        res.append({"x": new_x[i], "y": new_y[i], "t": new_t[i]})
-    return res
-
-def resample_drawing(strokes: List[List[Dict[str, float]]], points_per_stroke: int = 20) -> List[List[Dict[str, float]]]:
+    arr = points_to_array(stroke)
+    return array_to_points(resample_strokes_array(arr, np.array([0, len(arr)]), n)[0])
+
+def resample_drawing(strokes: Strokes, points_per_stroke: int = POINTS_PER_STROKE) -> Strokes:
     """
     Resamples every stroke in the drawing.
     """
     return [resample_stroke(s, points_per_stroke) for s in strokes]
 
-def extract_features(strokes: List[List[Dict[str, float]]]) -> np.ndarray:
+def extract_features(strokes: Strokes) -> np.ndarray:
     """
-    Extracts features for ML model. 
+    Extracts features for ML model.
     For a complex model, we might rasterize.
     For KNN/DTW, we might just return the resampled points sequence.
     For Random Forest, we need a fixed size vector.
-    
+
     Strategy: Resample to fixed total points (e.g. 5 strokes max, 20 pts each -> 100 pts).
     If fewer strokes, pad. If more, truncate or merge.
-    
+
     Let's go with a simplified approach:
     Flatten all resampled strokes into one sequence of (x,y) coordinates.
     """
-    # Calculate global features before normalization
-    num_strokes = float(len(strokes))
-    
-    # Calculate aspect ratio
-    all_points = []
-    for stroke in strokes:
-        for p in stroke:
-            all_points.append([p['x'], p['y']])
-            
-    if all_points:
-        arr = np.array(all_points)
-        min_vals = np.min(arr, axis=0)
-        max_vals = np.max(arr, axis=0)
-        width = max_vals[0] - min_vals[0]
-        height = max_vals[1] - min_vals[1]
-        aspect_ratio = width / height if height > 0 else 0.0
-    else:
-        aspect_ratio = 0.0
-
-    # Normalize first
-    norm_strokes = normalize(strokes)
-    # Resample
-    resampled = resample_drawing(norm_strokes, points_per_stroke=20)
-    
-    # For now, let's just return a flattened array of first 5 strokes * 20 points * 2 coords = 200 features
-    MAX_STROKES = 8
-    POINTS = 20
-    
-    features = []
-    
-    for i in range(MAX_STROKES):
-        if i < len(resampled):
-            s = resampled[i]
-            for p in s:
-                features.extend([p['x'], p['y']])
-        else:
-            # Pad with zeros
-            features.extend([0.0] * (POINTS * 2))
-            
-    # Append global features
-    features.append(num_strokes)
-    features.append(aspect_ratio)
-            
-    return np.array(features)
-
-def segment_strokes(points: List[Dict[str, float]]) -> List[List[Dict[str, float]]]:
+    arr, offsets = strokes_to_array(strokes)
+    return extract_features_array(arr, offsets)
+
+def segment_strokes(points: Points) -> Strokes:
     """
     Segments a flat list of points into strokes based on time difference.
     """
     if not points:
         return []
-    if len(points) == 1:
-        return [points]
-    
-    # Calculate deltas
-    deltas = []
-    for i in range(1, len(points)):
-        deltas.append(points[i]['t'] - points[i-1]['t'])
-    
-    if not deltas:
-        return [points]
-        
-    # Median
-    median = float(np.median(deltas))
-    
-    # Threshold calculation
-    # Max of (10 * median) or (150ms)
-    # 150ms to match frontend implementation plan heuristic
-    threshold = max(median * 10, 150)
-    
-    strokes = []
-    current_stroke = [points[0]]
-    
-    for i in range(1, len(points)):
-        dt = points[i]['t'] - points[i-1]['t']
-        if dt > threshold:
-            strokes.append(current_stroke)
-            current_stroke = []
-        
-        current_stroke.append(points[i])
-        
-    strokes.append(current_stroke)
-    return strokes
+    offsets = segment_strokes_array(points_to_array(points))
+    return [points[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
@@ -0,0 +1,60 @@
+"""
+Binary frames for /ws/record, used once a client has negotiated them with a
+{"action": "hello", "protocols": ["binary"]} text message. Text JSON messages keep
+working either way.
+
+A frame is a 12-byte header followed by count point records, all little-endian:
+
+    header  u1 version, u1 action, u2 flags, u4 request_id, u4 count
+    point   f4 x, f4 y, u4 t (ms since the drawing started)
+"""
+
+import struct
+from typing import NamedTuple
+import numpy as np
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("<BBHII")
+POINT_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("t", "<u4")])
+
+# Actions
+ACTION_CLASSIFY = 1
+# Streaming: add points to the connection's drawing buffer, classify it, or empty it
+ACTION_APPEND_POINTS = 2
+ACTION_CLASSIFY_CURRENT = 3
+ACTION_CLEAR = 4
+
+# Flags
+FLAG_BROADCAST = 1
+
+class Frame(NamedTuple):
+    action: int
+    request_id: int
+    flags: int
+    # Structured POINT_DTYPE view into the received bytes (no copy)
+    points: np.ndarray
+
+def decode_frame(data: bytes) -> Frame:
+    """Parses a binary frame. Raises ValueError if it is malformed."""
+    if len(data) < HEADER.size:
+        raise ValueError(f"Frame of {len(data)} bytes is shorter than its header")
+    version, action, flags, request_id, count = HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    if len(data) != HEADER.size + count * POINT_DTYPE.itemsize:
+        raise ValueError(f"Frame of {len(data)} bytes does not hold {count} points")
+    points = np.frombuffer(data, dtype=POINT_DTYPE, count=count, offset=HEADER.size)
+    return Frame(action, request_id, flags, points)
+
+def encode_frame(action: int, request_id: int, points: np.ndarray, flags: int = 0) -> bytes:
+    """Builds a frame from an (N, 3) x, y, t array; the inverse of decode_frame."""
+    records = np.empty(len(points), dtype=POINT_DTYPE)
+    if len(points):
+        records["x"], records["y"], records["t"] = points[:, 0], points[:, 1], points[:, 2]
+    return HEADER.pack(PROTOCOL_VERSION, action, flags, request_id, len(records)) + records.tobytes()
+
+def records_to_array(records: np.ndarray) -> np.ndarray:
+    """POINT_DTYPE records to the (N, 3) float64 array the processing pipeline takes."""
+    arr = np.empty((len(records), 3), dtype=np.float64)
+    arr[:, 0], arr[:, 1], arr[:, 2] = records["x"], records["y"], records["t"]
+    return arr
@@ -0,0 +1,199 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from trackpad_math import artifact
+from trackpad_math.model import SymbolClassifier
+
+# How often the monitor thread checks that the worker process is still alive
+POLL_INTERVAL = 0.5
+
+def _retrain_worker(model_type: str, staging_base: str, cascade_shortlist: int, progress):
+    """
+    Runs in a separate process: trains from the database and writes the model as an
+    artifact under staging_base. Reports ("progress", stage, fraction) messages, then
+    ("done", num_examples, trained_drawing_ids) or ("error", message).
+    """
+    # Imported here so the parent process doesn't need the DB layer to define the target
+    from trackpad_math.db import Database
+    from trackpad_math.feature_cache import load_training_set
+
+    try:
+        db = Database()
+        progress.put(("progress", "features", 0.0))
+        with db.session_scope() as session:
+            def on_chunk(done: int, total: int):
+                # Commit per chunk so the app isn't locked out of the database meanwhile
+                session.commit()
+                progress.put(("progress", "features", done / total))
+            training_set = load_training_set(session, on_chunk)
+
+        if not len(training_set):
+            progress.put(("error", "No drawings found in DB for training."))
+            return
+
+        progress.put(("progress", "training", 0.0))
+        classifier = SymbolClassifier(model_type, base_path=staging_base, cascade_shortlist=cascade_shortlist)
+        classifier.train_arrays(
+            training_set.labels,
+            features=training_set.features,
+            templates=training_set.templates,
+            template_offsets=training_set.template_offsets,
+        )
+        progress.put(("done", len(training_set), b"".join(i.bytes for i in training_set.ids)))
+    except Exception as e:
+        progress.put(("error", str(e)))
+
+class RetrainManager:
+    """
+    Retrains the classifier in a background worker process while the current model
+    keeps serving, then swaps the new model in (SymbolClassifier.install_model).
+
+    At most one job runs at a time. A request made while a job is running can't be
+    served by it (the job may already have read the database), so it marks a follow-up
+    job instead; any number of requests during one job collapse into that single rerun.
+    """
+
+    def __init__(self, classifier: SymbolClassifier, staging_base: str):
+        self.classifier = classifier
+        self.staging_base = staging_base
+        self.logger = logging.getLogger("app")
+        self._lock = threading.Lock()
+        self._ctx = multiprocessing.get_context("spawn")
+        self._process: Optional[Any] = None
+        self._job: Optional[Dict[str, Any]] = None
+        self._next_id = 1
+        self._rerun = False
+
+    def request(self) -> Dict[str, Any]:
+        """Starts a retrain, or schedules one after the running job. Returns the status."""
+        with self._lock:
+            if self._job is not None and self._job["state"] == "running":
+                self._rerun = True
+            else:
+                self._start()
+            return self._status()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._status()
+
+    def cancel(self):
+        """Stops the running job without installing its model, and drops a pending rerun."""
+        with self._lock:
+            self._rerun = False
+            if self._job is not None and self._job["state"] == "running":
+                self._job["state"] = "cancelled"
+                self._process.terminate()
+
+    def shutdown(self):
+        self.cancel()
+
+    def _status(self) -> Dict[str, Any]:
+        if self._job is None:
+            return {"state": "idle", "rerun_pending": False}
+        status = dict(self._job)
+        if status["state"] == "running":
+            status["duration_s"] = round(time.monotonic() - status.pop("_started"), 3)
+        else:
+            status.pop("_started")
+        status["rerun_pending"] = self._rerun
+        return status
+
+    def _start(self):
+        """Launches a job; the lock must be held."""
+        self._job = {
+            "job_id": self._next_id,
+            "state": "running",
+            "stage": "starting",
+            "progress": 0.0,
+            "started_at": datetime.now().isoformat(),
+            "duration_s": None,
+            "examples": None,
+            "replayed": None,
+            "error": None,
+            "_started": time.monotonic(),
+        }
+        self._next_id += 1
+        # From here on, taught examples are kept for replay into the new model
+        self.classifier.start_replay_log()
+        progress = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_retrain_worker,
+            args=(self.classifier.model_type, self.staging_base, self.classifier.cascade_shortlist, progress),
+            daemon=True,
+        )
+        try:
+            self._process.start()
+        except Exception as e:
+            self.logger.error(f"Could not start retrain worker: {e}")
+            self._job.update(state="failed", stage=None, error=str(e))
+            self.classifier.discard_replay_log()
+            return
+        threading.Thread(target=self._monitor, args=(self._job, self._process, progress), daemon=True).start()
+
+    def _monitor(self, job: Dict[str, Any], process, progress):
+        result = None
+        while result is None:
+            try:
+                message = progress.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                # The worker may have exited right after its last put
+                try:
+                    message = progress.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    message = ("error", f"Retrain worker exited with code {process.exitcode}")
+            if message[0] == "progress":
+                with self._lock:
+                    job["stage"], job["progress"] = message[1], message[2]
+            else:
+                result = message
+        process.join()
+
+        with self._lock:
+            # Installing under the lock means a cancel() (e.g. from a data reset) either
+            # happens first and wins, or waits until the new model is in place
+            replayed = None
+            error = result[1] if result[0] == "error" else None
+            if error is None and job["state"] == "running":
+                try:
+                    replayed = self._install(result[2])
+                except Exception as e:
+                    error = str(e)
+
+            if job["state"] == "running":
+                job["state"] = "failed" if error else "succeeded"
+            if job["state"] != "succeeded" and self._job is job:
+                self.classifier.discard_replay_log()
+            job.update(
+                stage=None,
+                progress=1.0 if job["state"] == "succeeded" else job["progress"],
+                duration_s=round(time.monotonic() - job["_started"], 3),
+                examples=result[1] if result[0] == "done" else None,
+                replayed=replayed,
+                error=error if job["state"] == "failed" else None,
+            )
+            self.logger.info(f"Retrain job {job['job_id']} {job['state']} after {job['duration_s']}s.")
+            if self._rerun:
+                self._rerun = False
+                self._start()
+
+    def _install(self, trained_ids: bytes) -> int:
+        staging = SymbolClassifier(
+            self.classifier.model_type, base_path=self.staging_base,
+            cascade_shortlist=self.classifier.cascade_shortlist
+        )
+        # Read into memory: the staging files are deleted once the model is installed
+        if not staging.load(mmap=False):
+            raise RuntimeError("Retrained model artifact could not be loaded")
+        ids = {UUID(bytes=trained_ids[i:i + 16]) for i in range(0, len(trained_ids), 16)}
+        replayed = self.classifier.install_model(staging.model, ids)
+        artifact.remove_artifact(staging.model_path)
+        return replayed
@@ -1,16 +1,24 @@
-import logging
+import base64
+import datetime
 import json
+import logging
 from uuid import UUID
 from typing import Optional
-from fastapi import APIRouter, HTTPException, UploadFile, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Response, UploadFile, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import literal, tuple_
 from pydantic import BaseModel
 
 from trackpad_math.db import Drawing
-from trackpad_math.state import DBSession, ClassifierInstance
+from trackpad_math.feature_cache import delete_features, load_training_set
+from trackpad_math.exporter import EXPORT_FORMATS, POINTS_ENCODINGS, gzip_chunks, iter_export
+from trackpad_math.importer import ImportBusy
+from trackpad_math.label_counts import add_label_counts, clear_label_counts, get_label_counts
+from trackpad_math.state import DatabaseInstance, DBSession, ClassifierInstance, ImporterInstance, RetrainerInstance
 from trackpad_math.model import SymbolClassifier
+from trackpad_math.processing import array_to_points
 
 router = APIRouter()
 
@@ -225,6 +233,10 @@ class TeachRequest(BaseModel):
     label: str
     points: Optional[list] = None # If None, use last recorded points
 
+def drawing_to_dict(d: Drawing) -> dict:
+    """JSON form of a Drawing; its points are stored packed and load as an array."""
+    return {"id": d.id, "label": d.label, "timestamp": d.timestamp, "points": array_to_points(d.points)}
+
 @router.get("/api/symbols/categorized")
 def get_categorized_symbols():
     """Return symbols grouped by category with descriptions."""
@@ -246,8 +258,8 @@ def get_category_items(name: str):
 @router.get("/api/symbol-metadata")
 def get_symbol_metadata(session: DBSession):
     """Get all unique labels and their counts, with descriptions."""
-    results = session.query(Drawing.label, func.count(Drawing.id)).group_by(Drawing.label).all()
-    data = {r[0]: r[1] for r in results}
+    # Maintained on every write, so this doesn't scan the drawings
+    data = get_label_counts(session)
 
     final_list = []
     for cat in CATEGORIZED_SYMBOLS:
@@ -271,9 +283,27 @@ def get_labels():
                 seen.add(item["symbol"])
     return final_list
 
+def encode_cursor(d) -> str:
+    """Opaque position after drawing d in the newest-first (timestamp, id) order."""
+    return base64.urlsafe_b64encode(json.dumps([d.timestamp.isoformat(), d.id.hex]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(timestamp), UUID(hex=id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/api/drawings")
-def get_drawings(session: DBSession, label: Optional[str] = None, limit: int = 100, exclude_points: bool = False):
-    """Get list of drawings, optionally filtered by label."""
+def get_drawings(session: DBSession, response: Response, label: Optional[str] = None, limit: int = 100,
+                 exclude_points: bool = False, cursor: Optional[str] = None):
+    """
+    Get list of drawings, newest first, optionally filtered by label. If there are
+    more, the X-Next-Cursor header holds the cursor to pass for the next page. Pages
+    seek on (timestamp, id) through an index, so a deep page costs the same as the first.
+    """
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
     if exclude_points:
         # Only select metadata columns
         q = session.query(Drawing.id, Drawing.label, Drawing.timestamp)
@@ -282,22 +312,31 @@ def get_drawings(session: DBSession, label: Optional[str] = None, limit: int = 1
         
     if label:
         q = q.filter(Drawing.label == label)
-    
-    # Use timestamp for ordering if it's a full Drawing object, 
-    # otherwise use the column from the query result
+    if cursor:
+        timestamp, id = decode_cursor(cursor)
+        # Typed like the columns, so they are bound in the stored format
+        q = q.filter(tuple_(Drawing.timestamp, Drawing.id) < tuple_(
+            literal(timestamp, Drawing.timestamp.type), literal(id, Drawing.id.type)
+        ))
+
+    # One extra row tells whether there is a next page
+    drawings_data = q.order_by(Drawing.timestamp.desc(), Drawing.id.desc()).limit(limit + 1).all()
+    if len(drawings_data) > limit:
+        drawings_data = drawings_data[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(drawings_data[-1])
+
     if exclude_points:
-        drawings_data = q.order_by(Drawing.timestamp.desc()).limit(limit).all()
         # Convert tuples to dicts for JSON response
-        return [{"id": d[0], "label": d[1], "timestamp": d[2]} for d in drawings_data]
+        return [{"id": d.id, "label": d.label, "timestamp": d.timestamp} for d in drawings_data]
     else:
-        return q.order_by(Drawing.timestamp.desc()).limit(limit).all()
+        return [drawing_to_dict(d) for d in drawings_data]
 
 @router.get("/api/drawings/{id}")
 def get_drawing(id: UUID, session: DBSession):
     d = session.query(Drawing).filter(Drawing.id == id).first()
     if not d:
         raise HTTPException(status_code=404, detail="Drawing not found")
-    return d
+    return drawing_to_dict(d)
 
 @router.delete("/api/drawings/{id}")
 def delete_drawing(id: UUID, session: DBSession):
@@ -305,6 +344,8 @@ def delete_drawing(id: UUID, session: DBSession):
     if not d:
         raise HTTPException(status_code=404, detail="Drawing not found")
     session.delete(d)
+    delete_features(session, [d.id])
+    add_label_counts(session, {d.label: -1})
     session.flush()
     return {"status": "deleted"}
 
@@ -323,96 +364,119 @@ async def teach_symbol(req: TeachRequest, session: DBSession, classifier: Classi
         points=points_to_save
     )
     session.add(new_drawing)
+    add_label_counts(session, {req.label: 1})
     session.flush()
     
     # Incrementally update the model with the new example
     try:
-        classifier.add_example(points_to_save, req.label)
+        # Off the event loop: the classifier may be busy installing a retrained model
+        await run_in_threadpool(classifier.add_example, points_to_save, req.label, drawing_id=new_drawing.id)
         model_updated = True
     except Exception as e:
         print(f"Warning: Could not update model incrementally: {e}")
         model_updated = False
     
-    return {"status": "saved", "id": str(new_drawing.id), "model_updated": model_updated}
+    return {
+        "status": "saved", "id": str(new_drawing.id), "model_updated": model_updated,
+        "model_version": classifier.snapshot.version,
+    }
 
 def train_model_from_db(session: Session, classifier: SymbolClassifier):
     """Business logic to train model from all drawings in DB."""
     logger = logging.getLogger("app")
-    drawings = session.query(Drawing).all()
-    if not drawings:
+    # Cached features/templates; only drawings without a current entry are processed
+    training_set = load_training_set(session)
+    if not len(training_set):
         logger.warning("No drawings found in DB for training.")
         return False
-        
-    points_list = [d.points for d in drawings]
-    labels_list = [d.label for d in drawings]
-    
-    logger.debug(f"Training model with {len(drawings)} examples.")
-    classifier.train(points_list, labels_list)
+
+    logger.debug(f"Training model with {len(training_set)} examples.")
+    classifier.train_arrays(
+        training_set.labels,
+        features=training_set.features,
+        templates=training_set.templates,
+        template_offsets=training_set.template_offsets,
+    )
     return True
 
 @router.post("/api/retrain")
-def retrain_model(session: DBSession, classifier: ClassifierInstance):
-    """Force model reload/retrain from DB."""
-    return train_model_from_db(session, classifier)
+def retrain_model(retrainer: RetrainerInstance):
+    """
+    Retrain from DB in the background; the current model serves until the new one is ready.
+    Requests made while a retrain is running collapse into one follow-up retrain.
+    """
+    return retrainer.request()
+
+@router.get("/api/retrain/status")
+def retrain_status(retrainer: RetrainerInstance):
+    """State, stage, progress and duration of the current or last retrain job."""
+    return retrainer.status()
 
 @router.get("/api/data/export")
-def export_data(session: DBSession):
-    """Export all training data as JSON."""
-    drawings = session.query(Drawing).all()
-    data = []
-    for d in drawings:
-        data.append({
-            "label": d.label,
-            "points": d.points,
-            "created_at": d.timestamp.isoformat() if d.timestamp else None
-        })
+def export_data(db: DatabaseInstance, format: str = "json", points: str = "json", compress: bool = False,
+                label: Optional[str] = None, since: Optional[datetime.datetime] = None,
+                until: Optional[datetime.datetime] = None):
+    """
+    Export training data, streamed as a JSON array (format=json, importable) or as
+    NDJSON (format=ndjson), optionally gzipped and with points=packed base64 blobs.
+    Filters by label and by timestamp range [since, until).
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if points not in POINTS_ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"points must be one of {', '.join(POINTS_ENCODINGS)}")
+
+    chunks = iter_export(db, format, points, label, since, until)
+    filename = f"training_data.{format}"
+    media_type = "application/json" if format == "json" else "application/x-ndjson"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if compress:
+        chunks, media_type = gzip_chunks(chunks), "application/gzip"
+        headers["Content-Disposition"] += ".gz"
+        # The file itself is the gzip; a set Content-Encoding keeps GZipMiddleware from compressing it again
+        headers["Content-Encoding"] = "identity"
     # Return as download with filename
-    return JSONResponse(
-        content=data,
-        headers={"Content-Disposition": "attachment; filename=training_data.json"}
-    )
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 @router.post("/api/data/import")
-async def import_data(file: UploadFile, session: DBSession, classifier: ClassifierInstance):
-    """Import training data from JSON file."""
+async def import_data(file: UploadFile, session: DBSession, importer: ImporterInstance, retrainer: RetrainerInstance):
+    """
+    Import training data from JSON file. The file is parsed and inserted in committed
+    chunks (progress at /api/data/import/status), then one background retrain runs.
+    """
     try:
-        content = await file.read()
-        data = json.loads(content)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid JSON file: {e}")
-        
-    if not isinstance(data, list):
-         raise HTTPException(status_code=400, detail="JSON must be a list of drawings")
-         
-    count = 0
-    for item in data:
-        if "label" not in item or "points" not in item:
-            continue
-            
-        # Basic validation passed
-        d = Drawing(
-            label=item["label"],
-            points=item["points"]
-            # Ignore timestamp on import, let it be now
-        )
-        session.add(d)
-        count += 1
-        
-    session.flush()
+        # Off the event loop: parsing and inserting a large file takes a while
+        result = await run_in_threadpool(importer.run, file.file, session, file.size)
+    except ImportBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        # Chunks committed before the error are in the DB, so the model still has to learn them
+        if importer.status()["imported"]:
+            retrainer.request()
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Retrain model with all data in DB (including imported)
-    try:
-        train_model_from_db(session, classifier)
-    except Exception as e:
-        print(f"Warning: Could not retrain model after import: {e}")
-    
-    return {"status": "imported", "count": count}
+    retrain = retrainer.request() if result["imported"] else retrainer.status()
+
+    return {
+        "status": "imported", "count": result["imported"], "skipped": result["skipped"],
+        "errors": result["errors"], "retrain": retrain,
+    }
+
+@router.get("/api/data/import/status")
+def import_status(importer: ImporterInstance):
+    """State, progress and counts of the current or last import."""
+    return importer.status()
 
 @router.delete("/api/data/reset")
-def reset_data(session: DBSession, classifier: ClassifierInstance):
+def reset_data(session: DBSession, classifier: ClassifierInstance, retrainer: RetrainerInstance):
     """Delete ALL training data and reset classifier."""
     try:
+        # A retrain still in flight would bring the deleted data back
+        retrainer.cancel()
         session.query(Drawing).delete()
+        delete_features(session)
+        clear_label_counts(session)
         session.flush()
         classifier.reset()
         return {"status": "reset"}
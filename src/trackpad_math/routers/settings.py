@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from trackpad_math.state import Settings, DBSession, ClassifierInstance
+from trackpad_math.state import Settings, DBSession, ClassifierInstance, InferencePoolInstance
 from trackpad_math.db import DBSetting
 
 router = APIRouter()
@@ -9,8 +9,13 @@ def get_status(classifier: ClassifierInstance):
     return {
         "model_loaded": classifier.is_trained,
         "model_type": classifier.model_type,
+        "model_version": classifier.snapshot.version,
     }
 
+@router.get("/api/inference/stats")
+def get_inference_stats(inference: InferencePoolInstance):
+    return inference.stats()
+
 @router.post("/api/settings")
 def update_settings(s: Settings, session: DBSession):
     db_settings = session.query(DBSetting).first()
@@ -1,85 +1,278 @@
+import asyncio
 import logging
+from trackpad_math.cursor import CursorController
+from trackpad_math.inference import InferenceBusy, InferencePool
 from trackpad_math.model import SymbolClassifier
+from trackpad_math.drawing_buffer import DrawingBuffer
+from trackpad_math.processing import STROKE_GAP_MIN_MS, DrawingLike, points_to_array
+from trackpad_math import protocol
 from trackpad_math.socket_manager import ConnectionManager
 import json
-from typing import Optional
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+import numpy as np
 from pydantic import BaseModel
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.concurrency import run_in_threadpool
 from trackpad_math import state
-from trackpad_math.state import ClassifierInstance, ConnectionManagerInstance
+from trackpad_math.state import (
+    ClassifierInstance, ConnectionManagerInstance, CursorControllerInstance, InferencePoolInstance
+)
 
 router = APIRouter()
 
+# A streamed drawing that gets no new points for this long has finished a stroke
+# (shorter gaps never split one), so it is classified ahead of classify_current
+SPECULATE_AFTER_S = STROKE_GAP_MIN_MS / 1000
+
 class ToggleResponse(BaseModel):
     status: str
     symbol: Optional[str] = None
     confidence: Optional[float] = None
     candidates: Optional[list] = None
+    # Echo of the request's points; JSON protocol only
     points: Optional[list] = None
+    request_id: Optional[int] = None
     message: Optional[str] = None
+    # Version of the model snapshot that produced the prediction
+    model_version: Optional[int] = None
+    # True when the inference queue was full and a cheaper model answered
+    degraded: Optional[bool] = None
 
 @router.websocket("/ws/record")
-async def websocket_record(websocket: WebSocket, manager: ConnectionManagerInstance, classifier: ClassifierInstance):
+async def websocket_record(websocket: WebSocket, manager: ConnectionManagerInstance, classifier: ClassifierInstance,
+                           inference: InferencePoolInstance, cursor: CursorControllerInstance):
     await manager.connect(websocket)
+    # The connection's latest classification; a newer classify supersedes it
+    classification: Optional[asyncio.Task] = None
+    # Set once the client negotiated binary point frames (see trackpad_math.protocol)
+    binary = False
+    # The drawing streamed with append_points, so each message only carries new points
+    drawing = DrawingBuffer()
+    # Provisional classification of the drawing's first n points, as (n, task), and
+    # the timer that starts it once the stream pauses
+    speculation: Optional[Tuple[int, asyncio.Task]] = None
+    speculation_timer: Optional[asyncio.TimerHandle] = None
+
+    def classify(points: Optional[DrawingLike], broadcast: bool, request_id: Optional[int], echo_points: Optional[list],
+                 pending: Optional[asyncio.Task] = None, prepare: Optional[Callable[[], DrawingLike]] = None):
+        nonlocal classification
+        # In auto mode the same drawing is resent as it grows, so a pending
+        # result for an earlier version of it is stale
+        if classification is not None and not classification.done():
+            classification.cancel()
+        classification = asyncio.create_task(process_classification(
+            points, manager, classifier, inference, websocket, broadcast, request_id, echo_points, pending, prepare
+        ))
+        classification.add_done_callback(_log_classification_error)
+
+    def cancel_speculation():
+        nonlocal speculation, speculation_timer
+        if speculation_timer is not None:
+            speculation_timer.cancel()
+            speculation_timer = None
+        if speculation is not None:
+            speculation[1].cancel()
+            speculation = None
+
+    def speculate():
+        nonlocal speculation, speculation_timer
+        speculation_timer = None
+        if not classifier.is_trained or not len(drawing):
+            return
+        if speculation is not None:
+            speculation[1].cancel()
+        # Only the strokes that changed since the last prepare() are processed again
+        task = asyncio.create_task(predict_prepared(len(drawing)))
+        speculation = (len(drawing), task)
+        task.add_done_callback(send_provisional)
+
+    async def predict_prepared(upto: int):
+        # Off the event loop: a long drawing takes a while to segment and resample
+        return await inference.predict(await run_in_threadpool(drawing.prepare, upto))
+
+    def send_provisional(task: asyncio.Task):
+        # Skipped if classify_current has taken the result over, or the drawing moved on
+        if speculation is None or speculation[1] is not task or task.cancelled() or task.exception() is not None:
+            return
+        predictions, model_version, degraded = task.result()
+        if predictions:
+            reply(manager, websocket, result_message("provisional", predictions, model_version, degraded))
+
+    def append_points(points: np.ndarray, request_id: Optional[int]):
+        nonlocal speculation_timer
+        try:
+            drawing.append(points)
+        except ValueError as e:
+            reply(manager, websocket, {"status": "error", "message": str(e), "request_id": request_id})
+            return
+        if speculation_timer is not None:
+            speculation_timer.cancel()
+        speculation_timer = asyncio.get_running_loop().call_later(SPECULATE_AFTER_S, speculate)
+
+    def classify_current(broadcast: bool, request_id: Optional[int]):
+        nonlocal speculation
+        if not len(drawing):
+            reply(manager, websocket, {"status": "idle", "message": "No points", "request_id": request_id}, broadcast)
+            return
+        if speculation is not None and speculation[0] == len(drawing) and not speculation[1].cancelled():
+            # The drawing hasn't changed since the pause: reuse its classification
+            pending = speculation[1]
+            speculation = None
+            classify(None, broadcast, request_id, None, pending)
+            return
+        cancel_speculation()
+        # Only the points received so far: the buffer keeps growing while it's prepared
+        classify(None, broadcast, request_id, None, prepare=partial(drawing.prepare, len(drawing)))
+
     try:
         while True:
-            message = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                if not binary:
+                    reply(manager, websocket, {"status": "error", "message": "Send a hello before binary frames"})
+                    continue
+                try:
+                    frame = protocol.decode_frame(message["bytes"])
+                except ValueError as e:
+                    reply(manager, websocket, {"status": "error", "message": f"Bad frame: {e}"})
+                    continue
+                broadcast = bool(frame.flags & protocol.FLAG_BROADCAST)
+                if frame.action == protocol.ACTION_CLASSIFY and len(frame.points):
+                    classify(protocol.records_to_array(frame.points), broadcast, frame.request_id, None)
+                elif frame.action == protocol.ACTION_APPEND_POINTS:
+                    append_points(protocol.records_to_array(frame.points), frame.request_id)
+                elif frame.action == protocol.ACTION_CLASSIFY_CURRENT:
+                    classify_current(broadcast, frame.request_id)
+                elif frame.action == protocol.ACTION_CLEAR:
+                    cancel_speculation()
+                    drawing.clear()
+                continue
+
             try:
-                data = json.loads(message)
+                data = json.loads(message["text"])
             except json.JSONDecodeError:
                 print("Failed to decode JSON")
                 continue
 
             action = data.get('action')
 
-            if action == 'set_cursor':
+            if action == 'hello':
+                binary = "binary" in data.get('protocols', [])
+                reply(manager, websocket, {
+                    "status": "hello",
+                    "protocol": "binary" if binary else "json",
+                    "version": protocol.PROTOCOL_VERSION,
+                })
+
+            elif action == 'set_cursor':
                 x = data.get('x')
                 y = data.get('y')
                 if x is not None and y is not None:
-                    # Run blocking cursor move in threadpool
-                    await run_in_threadpool(reset_cursor, int(x), int(y))
-                    await manager.broadcast({"status": "cursor_reset"})
+                    reset_cursor(cursor, manager, websocket, int(x), int(y), data.get('broadcast', False))
             
             elif action == 'classify':
                 points = data.get('points')
                 if points:
-                    await process_classification(points, manager, classifier)
+                    classify(points_to_array(points), data.get('broadcast', False), data.get('request_id'), points)
+
+            elif action == 'append_points':
+                append_points(points_to_array(data.get('points') or []), data.get('request_id'))
+
+            elif action == 'classify_current':
+                classify_current(data.get('broadcast', False), data.get('request_id'))
+
+            elif action == 'clear':
+                cancel_speculation()
+                drawing.clear()
 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on errors, e.g. malformed points, so nothing of the connection outlives it
         manager.disconnect(websocket)
+        cancel_speculation()
+        if classification is not None:
+            classification.cancel()
 
-def reset_cursor(x, y):
-    try:
-        from pynput import mouse
-        mouse_controller = mouse.Controller()
-        mouse_controller.position = (x, y)
-    except Exception as e:
-        print(f"Warning: Could not reset cursor: {e}")
+def _log_classification_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.getLogger("app").error(f"Classification failed: {task.exception()!r}")
 
-async def process_classification(points, manager: ConnectionManager, classifier: SymbolClassifier):
-    logger = logging.getLogger("app")
-    logger.info("Processing classification")
-    if not classifier.is_trained:
-        await manager.broadcast({"status": "error", "message": "Model not trained"})
-        return
+def reset_cursor(cursor: CursorController, manager: ConnectionManager, websocket: WebSocket, x: int, y: int,
+                 broadcast: bool = False):
+    """
+    Queues the move without waiting for it, so a burst of set_cursor messages can be
+    coalesced by the cursor worker; cursor_reset is sent once the move was applied.
+    """
+    moved = asyncio.wrap_future(cursor.move(x, y))
+    moved.add_done_callback(lambda _: reply(manager, websocket, {"status": "cursor_reset"}, broadcast))
 
-    # Run heavy prediction in threadpool
-    predictions = await run_in_threadpool(classifier.predict, points)
-    
-    if not predictions:
-        await manager.broadcast({"status": "idle", "message": "No prediction"})
-        return
-         
+def reply(manager: ConnectionManager, websocket: WebSocket, message: dict, broadcast: bool = False):
+    """Sends message to the requesting connection, or to every connection if the client asked for it."""
+    if broadcast:
+        manager.broadcast(message)
+    else:
+        manager.send(websocket, message)
+
+def result_message(status: str, predictions: List[Tuple[str, float]], model_version: int, degraded: bool,
+                   request_id: Optional[int] = None, echo_points: Optional[list] = None) -> dict:
     pred, conf = predictions[0]
     candidates = [{"symbol": p[0], "confidence": p[1]} for p in predictions if p[1] > 0 and p[0] != pred]
     
     response = ToggleResponse(
-        status="finished",
+        status=status,
         symbol=pred,
         confidence=conf,
         candidates=candidates,
-        points=points
+        points=echo_points,
+        request_id=request_id,
+        model_version=model_version,
+        degraded=degraded
     )
-    await manager.broadcast(response.dict())
+    return response.dict(exclude_none=echo_points is None)
+
+async def process_classification(points: Optional[DrawingLike], manager: ConnectionManager, classifier: SymbolClassifier,
+                                 inference: InferencePool, websocket: WebSocket, broadcast: bool = False,
+                                 request_id: Optional[int] = None, echo_points: Optional[list] = None,
+                                 pending: Optional[asyncio.Task] = None,
+                                 prepare: Optional[Callable[[], DrawingLike]] = None):
+    """
+    Classifies an (N, 3) points array or a PreparedDrawing and replies. echo_points is
+    the JSON request's point list, sent back for JSON clients; binary clients only get
+    ids and scores. pending is an inference.predict() task already running for the
+    drawing, awaited instead of classifying points; prepare, if given, produces the
+    points in the threadpool.
+    """
+    logger = logging.getLogger("app")
+    logger.info("Processing classification")
+    ids = {} if request_id is None else {"request_id": request_id}
+    if not classifier.is_trained:
+        reply(manager, websocket, {"status": "error", "message": "Model not trained", **ids}, broadcast)
+        return
+
+    # Heavy prediction runs in the inference worker pool
+    try:
+        if pending is not None:
+            # Shielded: superseding this classification must not cancel the shared task
+            predictions, model_version, degraded = await asyncio.shield(pending)
+        else:
+            if prepare is not None:
+                points = await run_in_threadpool(prepare)
+            predictions, model_version, degraded = await inference.predict(points)
+    except InferenceBusy as e:
+        reply(manager, websocket, {"status": "busy", "message": str(e), **ids}, broadcast)
+        return
+    
+    if not predictions:
+        reply(manager, websocket, {"status": "idle", "message": "No prediction", **ids}, broadcast)
+        return
+         
+    # Only queued here; the connection's sender task writes it, so superseding this
+    # classification can't cut a message off mid-send
+    reply(manager, websocket, result_message("finished", predictions, model_version, degraded, request_id, echo_points),
+          broadcast)
 
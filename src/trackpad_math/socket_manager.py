@@ -1,17 +1,98 @@
-from typing import List
+import asyncio
+import logging
+from typing import Dict, Optional, Set
 from fastapi import WebSocket
 
+# What to do with a connection whose send queue is full: drop its oldest queued
+# message to make room, or evict the connection
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+class Connection:
+    """A websocket plus its bounded send queue, drained by its own sender task."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """
+    Tracks the open websockets. send() addresses one connection, broadcast() all of
+    them; both only enqueue, so no caller waits on a socket. Each connection's queue
+    is drained concurrently by its own task, so a slow client only delays itself.
+
+    A full queue is handled by slow_consumer: "drop_oldest" discards the oldest queued
+    message, "disconnect" evicts the connection. A send that fails or takes longer
+    than send_timeout seconds evicts the connection too.
+    """
+
+    def __init__(self, queue_size: int = 32, slow_consumer: str = "drop_oldest", send_timeout: float = 5.0):
+        if slow_consumer not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {slow_consumer}")
+        self.queue_size = max(1, queue_size)
+        self.slow_consumer = slow_consumer
+        self.send_timeout = send_timeout
+        self.logger = logging.getLogger("app")
+        self.active_connections: Dict[WebSocket, Connection] = {}
+        # Close tasks of evicted sockets (the loop only keeps weak references to tasks)
+        self._closing: Set[asyncio.Task] = set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = Connection(websocket, self.queue_size)
+        connection.sender = asyncio.create_task(self._drain(connection))
+        self.active_connections[websocket] = connection
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        """Forgets the connection and stops its sender; safe to call more than once."""
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queues message for one connection; a no-op if it has gone away."""
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, message)
+
+    def broadcast(self, message: dict):
+        for connection in list(self.active_connections.values()):
+            self._enqueue(connection, message)
+
+    def shutdown(self):
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
+
+    def _enqueue(self, connection: Connection, message: dict):
+        if connection.queue.full():
+            if self.slow_consumer == "disconnect":
+                self.logger.warning("Websocket client is not keeping up; disconnecting it.")
+                self._evict(connection)
+                return
+            connection.queue.get_nowait()
+            self.logger.debug("Websocket client is not keeping up; dropped its oldest queued message.")
+        connection.queue.put_nowait(message)
+
+    async def _drain(self, connection: Connection):
+        while True:
+            message = await connection.queue.get()
+            try:
+                await asyncio.wait_for(connection.websocket.send_json(message), self.send_timeout)
+            except Exception as e:
+                # Closed, broken or stalled socket
+                self.logger.info(f"Evicting websocket after failed send: {e!r}")
+                self._evict(connection)
+                return
+
+    def _evict(self, connection: Connection):
+        self.disconnect(connection.websocket)
+        # Closing makes the connection's receive loop end with WebSocketDisconnect
+        task = asyncio.ensure_future(self._close(connection.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
@@ -3,8 +3,12 @@ from fastapi import Request, Depends, WebSocket
 from starlette.requests import HTTPConnection
 from typing import Annotated, Generator
 from pydantic import BaseModel, ConfigDict
+from trackpad_math.cursor import CursorController
 from trackpad_math.db import Database
+from trackpad_math.importer import ImportManager
+from trackpad_math.inference import InferencePool
 from trackpad_math.model import SymbolClassifier
+from trackpad_math.retrain import RetrainManager
 from trackpad_math.socket_manager import ConnectionManager
 
 class Settings(BaseModel):
@@ -15,6 +19,9 @@ class Settings(BaseModel):
     equation_scroll_x_sensitivity: int = 20
     equation_scroll_y_sensitivity: int = 20
 
+def get_database(conn: HTTPConnection) -> Database:
+    return conn.app.state.db
+
 def get_db_session(conn: HTTPConnection) -> Generator:
     db: Database = conn.app.state.db
     with db.session_scope() as session:
@@ -23,9 +30,26 @@ def get_db_session(conn: HTTPConnection) -> Generator:
 def get_classifier(conn: HTTPConnection) -> SymbolClassifier:
     return conn.app.state.classifier
 
+def get_retrainer(conn: HTTPConnection) -> RetrainManager:
+    return conn.app.state.retrainer
+
+def get_importer(conn: HTTPConnection) -> ImportManager:
+    return conn.app.state.importer
+
+def get_inference_pool(conn: HTTPConnection) -> InferencePool:
+    return conn.app.state.inference
+
 def get_connection_manager(conn: HTTPConnection) -> ConnectionManager:
     return conn.app.state.socket_manager
 
+def get_cursor_controller(conn: HTTPConnection) -> CursorController:
+    return conn.app.state.cursor
+
+DatabaseInstance = Annotated[Database, Depends(get_database)]
 DBSession = Annotated[Session, Depends(get_db_session)]
 ClassifierInstance = Annotated[SymbolClassifier, Depends(get_classifier)]
+RetrainerInstance = Annotated[RetrainManager, Depends(get_retrainer)]
+ImporterInstance = Annotated[ImportManager, Depends(get_importer)]
+InferencePoolInstance = Annotated[InferencePool, Depends(get_inference_pool)]
 ConnectionManagerInstance = Annotated[ConnectionManager, Depends(get_connection_manager)]
+CursorControllerInstance = Annotated[CursorController, Depends(get_cursor_controller)]
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+from trackpad_math import artifact
+
+def write(path, rows: int = 10):
+    arrays = {"X": np.arange(rows * 3, dtype=np.float32).reshape(rows, 3), "y": np.arange(rows, dtype=np.int64)}
+    return arrays, artifact.write_artifact(str(path), "knn", 1, "p1", arrays, {"classes": []})
+
+def flip_byte(path, name, offset_from_end: int = 1):
+    header = artifact.read_header(str(path))
+    file_path = os.path.join(str(path), header["arrays"][name]["file"])
+    with open(file_path, "r+b") as f:
+        f.seek(-offset_from_end, os.SEEK_END)
+        b = f.read(1)
+        f.seek(-offset_from_end, os.SEEK_END)
+        f.write(bytes([b[0] ^ 1]))
+
+def test_write_and_read(tmp_path):
+    arrays, _ = write(tmp_path)
+    header, loaded = artifact.read_artifact(str(tmp_path))
+    assert header["model_version"] == 1
+    for name, arr in arrays.items():
+        assert isinstance(loaded[name], np.memmap)
+        np.testing.assert_array_equal(loaded[name], arr)
+
+def test_append_and_reload(tmp_path):
+    arrays, header = write(tmp_path)
+    grown = {name: np.concatenate([arr, arr[:2]]) for name, arr in arrays.items()}
+    files = sorted(os.listdir(tmp_path))
+    appended = artifact.append_rows(str(tmp_path), 2, grown, {"classes": []})
+    # Grown in place: same files, new header
+    assert sorted(os.listdir(tmp_path)) == files
+    assert appended["model_version"] == 2
+
+    _, full = artifact.read_artifact(str(tmp_path))
+    _, tail_only = artifact.read_artifact(str(tmp_path), verified=header["arrays"])
+    for name, arr in grown.items():
+        np.testing.assert_array_equal(full[name], arr)
+        np.testing.assert_array_equal(tail_only[name], arr)
+
+def test_corrupt_appended_rows_are_detected(tmp_path):
+    arrays, header = write(tmp_path)
+    grown = {name: np.concatenate([arr, arr[:2]]) for name, arr in arrays.items()}
+    artifact.append_rows(str(tmp_path), 2, grown, {"classes": []})
+    flip_byte(tmp_path, "X")
+    with pytest.raises(ValueError, match="checksum"):
+        artifact.read_artifact(str(tmp_path))
+    # Checking only the rows past the verified ones still covers the corrupted tail
+    with pytest.raises(ValueError, match="checksum"):
+        artifact.read_artifact(str(tmp_path), verified=header["arrays"])
+
+def test_uncommitted_rows_are_ignored(tmp_path):
+    arrays, header = write(tmp_path)
+    file_path = os.path.join(str(tmp_path), header["arrays"]["y"]["file"])
+    # An append that crashed before committing its header
+    with open(file_path, "ab") as f:
+        f.write(b"\x01" * 64)
+    _, loaded = artifact.read_artifact(str(tmp_path))
+    np.testing.assert_array_equal(loaded["y"], arrays["y"])
+
+def test_truncated_array_is_detected(tmp_path):
+    _, header = write(tmp_path)
+    file_path = os.path.join(str(tmp_path), header["arrays"]["X"]["file"])
+    with open(file_path, "r+b") as f:
+        f.truncate(os.path.getsize(file_path) - 4)
+    with pytest.raises(ValueError):
+        artifact.read_artifact(str(tmp_path))
+
+def test_incompatible_append_needs_a_rewrite(tmp_path):
+    arrays, _ = write(tmp_path)
+    wider = dict(arrays, X=np.zeros((12, 4), dtype=np.float32))
+    assert artifact.append_rows(str(tmp_path), 2, wider, {"classes": []}) is None
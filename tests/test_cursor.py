@@ -0,0 +1,76 @@
+import logging
+import threading
+
+from trackpad_math.cursor import CursorController
+
+class FakeBackend:
+    """Records moves; the first one blocks until release is set, to keep the worker busy."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.moves = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def move(self, x: int, y: int):
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise OSError("no display")
+        self.moves.append((x, y))
+
+def test_burst_is_coalesced():
+    backend = FakeBackend()
+    cursor = CursorController(backend_factory=lambda: backend)
+    try:
+        first = cursor.move(0, 0)
+        assert backend.started.wait(5)
+        burst = [cursor.move(i, i) for i in range(1, 11)]
+        backend.release.set()
+        assert first.result(5) is True
+        assert all(future.result(5) is True for future in burst)
+        # One move for the first request, one for the whole burst, at its latest position
+        assert backend.moves == [(0, 0), (10, 10)]
+        assert cursor.moves == 2
+        assert cursor.coalesced == 9
+    finally:
+        cursor.shutdown()
+
+def test_failures_are_logged_once(caplog):
+    backend = FakeBackend(fail=True)
+    backend.release.set()
+    cursor = CursorController(backend_factory=lambda: backend)
+    try:
+        with caplog.at_level(logging.WARNING, logger="app"):
+            assert [cursor.move(i, i).result(5) for i in range(3)] == [False, False, False]
+            backend.fail = False
+            assert cursor.move(5, 5).result(5) is True
+            backend.fail = True
+            assert cursor.move(6, 6).result(5) is False
+        failures = [r for r in caplog.records if "Could not reset cursor" in r.getMessage()]
+        # Once for the first run of failures, once more after the move that succeeded
+        assert len(failures) == 2
+    finally:
+        cursor.shutdown()
+
+def test_setup_failure_resolves_false(caplog):
+    def broken():
+        raise ImportError("no pynput")
+
+    with caplog.at_level(logging.WARNING, logger="app"):
+        cursor = CursorController(backend_factory=broken)
+        try:
+            assert cursor.move(1, 1).result(5) is False
+            assert cursor.move(2, 2).result(5) is False
+        finally:
+            cursor.shutdown()
+    assert len([r for r in caplog.records if "Could not set up cursor control" in r.getMessage()]) == 1
+
+def test_moves_after_shutdown_resolve_false():
+    backend = FakeBackend()
+    backend.release.set()
+    cursor = CursorController(backend_factory=lambda: backend)
+    assert cursor.move(1, 1).result(5) is True
+    cursor.shutdown()
+    assert cursor.move(2, 2).result(5) is False
+    assert backend.moves == [(1, 1)]
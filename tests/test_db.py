@@ -0,0 +1,124 @@
+import datetime
+import uuid
+from typing import Dict, List
+
+import numpy as np
+import pytest
+from sqlalchemy import JSON, DateTime, String, Uuid, create_engine, func, inspect, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from trackpad_math.db import Database, Drawing, decode_points, encode_points
+from trackpad_math import migrations
+from trackpad_math.migrations import LATEST_VERSION
+from trackpad_math.processing import points_to_array
+
+def test_points_round_trip():
+    points = [{"x": 10.5, "y": -3.25, "t": 0}, {"x": 11.0, "y": -2.0, "t": 16}, {"x": 12.75, "y": 0.5, "t": 33}]
+    arr = decode_points(encode_points(points))
+    assert arr.dtype == np.float64
+    np.testing.assert_array_equal(arr, points_to_array(points))
+
+def test_points_round_trip_empty():
+    arr = decode_points(encode_points([]))
+    assert arr.shape == (0, 3)
+
+def test_points_round_trip_large_t0():
+    # Epoch milliseconds don't fit in float32; only the deltas are stored as float32
+    t0 = 1.7e12
+    arr = np.array([[0.0, 0.0, t0], [1.0, 2.0, t0 + 8], [3.0, 4.0, t0 + 24]])
+    np.testing.assert_array_equal(decode_points(encode_points(arr)), arr)
+
+def test_points_round_trip_fractional_t():
+    arr = np.array([[0.0, 0.0, 0.25], [1.0, 1.0, 16.9], [2.0, 2.0, 33.3], [3.0, 3.0, 50.05]])
+    out = decode_points(encode_points(arr))
+    np.testing.assert_array_equal(out[:, :2], arr[:, :2])
+    np.testing.assert_allclose(out[:, 2], arr[:, 2], atol=1e-4)
+
+def test_points_unknown_format_version():
+    blob = bytearray(encode_points([{"x": 1, "y": 2, "t": 3}]))
+    blob[0] = 99
+    with pytest.raises(ValueError):
+        decode_points(bytes(blob))
+
+class BaselineBase(DeclarativeBase):
+    pass
+
+class BaselineDrawing(BaselineBase):
+    """The drawings table as created before schema versioning: points as JSON."""
+    __tablename__ = "drawings"
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    label: Mapped[str] = mapped_column(String, index=True)
+    timestamp: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    points: Mapped[List[Dict[str, float]]] = mapped_column(JSON)
+
+@pytest.fixture
+def database_url(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    return url
+
+BASELINE_DRAWINGS = {
+    "x": [{"x": 0, "y": 0, "t": 0}, {"x": 5, "y": 5, "t": 16}],
+    "y": [{"x": 1.5, "y": 2.5, "t": 1.7e12}, {"x": 3, "y": 4, "t": 1.7e12 + 20}],
+    "z": [{"x": 7, "y": 8, "t": 0}],
+}
+
+def create_baseline_database(url: str) -> Dict[uuid.UUID, datetime.datetime]:
+    """Creates a baseline-schema database holding BASELINE_DRAWINGS; returns their timestamps by id."""
+    engine = create_engine(url)
+    BaselineBase.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(BaselineDrawing(label=label, points=points) for label, points in BASELINE_DRAWINGS.items())
+        session.commit()
+        before = {r.id: r.timestamp for r in session.query(BaselineDrawing)}
+    engine.dispose()
+    return before
+
+def test_migrate_baseline_database(database_url):
+    drawings = BASELINE_DRAWINGS
+    before = create_baseline_database(database_url)
+
+    db = Database()
+    db.init_db()
+    with db.engine.connect() as conn:
+        assert conn.execute(text("SELECT version FROM schema_version")).scalar_one() == LATEST_VERSION
+        indexes = {index["name"] for index in inspect(conn).get_indexes("drawings")}
+        assert {"ix_drawings_label_timestamp", "ix_drawings_timestamp"} <= indexes
+        assert "ix_drawings_label" not in indexes
+        assert "drawings_json" not in inspect(conn).get_table_names()
+    with db.session_scope() as session:
+        rows = session.query(Drawing).all()
+        assert len(rows) == len(drawings)
+        for row in rows:
+            assert row.timestamp == before[row.id]
+            np.testing.assert_array_equal(row.points, points_to_array(drawings[row.label]))
+
+    # Already at the latest version: nothing to do
+    db.init_db()
+    with db.session_scope() as session:
+        assert session.query(Drawing).count() == len(drawings)
+
+def test_failed_migration_rolls_back(database_url, monkeypatch):
+    create_baseline_database(database_url)
+
+    def fail(points):
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(migrations, "encode_points", fail)
+    db = Database()
+    with pytest.raises(RuntimeError):
+        db.init_db()
+    # Nothing of the half-done migration is left, the DDL included
+    with db.engine.connect() as conn:
+        assert set(inspect(conn).get_table_names()) == {"drawings"}
+        assert {c["name"] for c in inspect(conn).get_columns("drawings")} == {"id", "label", "timestamp", "points"}
+        assert conn.execute(text("SELECT COUNT(*) FROM drawings")).scalar_one() == len(BASELINE_DRAWINGS)
+
+    monkeypatch.undo()
+    db.init_db()
+    with db.session_scope() as session:
+        rows = session.query(Drawing).all()
+        assert sorted(r.label for r in rows) == sorted(BASELINE_DRAWINGS)
+        for row in rows:
+            np.testing.assert_array_equal(row.points, points_to_array(BASELINE_DRAWINGS[row.label]))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from trackpad_math.dtw import CHUNK_SIZE, DTWIndex, dtw_distance
+
+def random_templates(rng: np.random.Generator, count: int):
+    return [rng.normal(size=(rng.integers(1, 30), 2)) for _ in range(count)]
+
+def brute_force(templates, labels, query, k, mask=None):
+    """The k closest distinct labels by dtw_distance over every (unmasked) template."""
+    best = {}
+    for i, (template, label) in enumerate(zip(templates, labels)):
+        if mask is not None and not mask[i]:
+            continue
+        dist = dtw_distance(query, template)
+        best[label] = min(dist, best.get(label, np.inf))
+    return sorted(best.items(), key=lambda x: x[1])[:k]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_query_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    # More templates than one chunk, so pruning across chunks is exercised
+    templates = random_templates(rng, 3 * CHUNK_SIZE)
+    labels = [f"l{i % 12}" for i in range(len(templates))]
+    index = DTWIndex.from_templates(templates, labels)
+    for _ in range(3):
+        query = rng.normal(size=(rng.integers(1, 30), 2))
+        matches, stats = index.query(query, k=5)
+        expected = brute_force(templates, labels, query, 5)
+        assert [label for label, _ in matches] == [label for label, _ in expected]
+        np.testing.assert_allclose([d for _, d in matches], [d for _, d in expected], rtol=1e-9)
+        assert stats["kim_pruned"] + stats["lb_pruned"] + stats["abandoned"] + stats["computed"] == len(templates)
+
+def test_query_with_mask():
+    rng = np.random.default_rng(7)
+    templates = random_templates(rng, 50)
+    labels = [f"l{i % 7}" for i in range(len(templates))]
+    index = DTWIndex.from_templates(templates, labels)
+    mask = rng.random(len(templates)) < 0.4
+    query = rng.normal(size=(12, 2))
+    matches, _ = index.query(query, k=3, mask=mask)
+    expected = brute_force(templates, labels, query, 3, mask)
+    assert [label for label, _ in matches] == [label for label, _ in expected]
+    np.testing.assert_allclose([d for _, d in matches], [d for _, d in expected], rtol=1e-9)
+
+def test_added_templates_are_searched():
+    rng = np.random.default_rng(3)
+    index = DTWIndex.from_templates(random_templates(rng, 10), ["a"] * 10)
+    # Longer than every template so far: the padded buffer has to widen
+    query = rng.normal(size=(40, 2))
+    index = index.with_example(query, "b")
+    matches, _ = index.query(query, k=1)
+    assert matches == [("b", 0.0)]
+
+def test_empty_index():
+    matches, stats = DTWIndex().query(np.zeros((5, 2)))
+    assert matches == []
+    assert stats["templates"] == 0
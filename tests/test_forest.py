@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from trackpad_math.forest import PackedForest
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 8))
+    y = np.array(["a", "b", "c", "d"])[(X[:, 0] > 0) + 2 * (X[:, 1] + X[:, 2] > 0.5)]
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+    return model, rng.normal(size=(100, 8))
+
+def test_predict_proba_matches_sklearn(fitted):
+    model, X = fitted
+    forest = PackedForest.from_sklearn(model)
+    assert forest.classes == list(model.classes_)
+    np.testing.assert_array_equal(forest.predict_proba_batch(X), model.predict_proba(X))
+    np.testing.assert_array_equal(forest.predict_proba(X[0]), model.predict_proba(X[:1])[0])
+
+def test_leaves_match_sklearn(fitted):
+    model, X = fitted
+    forest = PackedForest.from_sklearn(model)
+    # sklearn's leaf ids are per tree; PackedForest's are offsets into the concatenated nodes
+    np.testing.assert_array_equal(forest.apply_batch(X) - forest.roots, model.apply(X))
+
+def test_missing_values_match_sklearn():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(200, 4))
+    y = (X[:, 0] > 0).astype(int)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    model = RandomForestClassifier(n_estimators=10, random_state=1).fit(X, y)
+    test = rng.normal(size=(50, 4))
+    test[rng.random(test.shape) < 0.2] = np.nan
+    np.testing.assert_array_equal(PackedForest.from_sklearn(model).predict_proba_batch(test), model.predict_proba(test))
+
+def test_artifact_round_trip(fitted):
+    model, X = fitted
+    forest = PackedForest.from_sklearn(model)
+    arrays, meta = forest.to_artifact()
+    restored = PackedForest.from_artifact(arrays, meta)
+    np.testing.assert_array_equal(restored.predict_proba_batch(X), forest.predict_proba_batch(X))
+    assert restored.rank(X[0]) == forest.rank(X[0])
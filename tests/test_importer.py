@@ -0,0 +1,102 @@
+import base64
+import io
+import json
+
+import numpy as np
+import pytest
+
+from trackpad_math import importer
+from trackpad_math.db import Database, Drawing, encode_points
+from trackpad_math.importer import ImportManager, iter_json_array, validate_item
+
+POINTS = [{"x": 1.5, "y": 2.0, "t": 0}, {"x": 3.25, "y": -1e-3, "t": 16}]
+
+def parse(text: str):
+    return list(iter_json_array(io.BytesIO(text.encode("utf-8"))))
+
+@pytest.fixture(params=[1, 3, 65536], ids=["read-1", "read-3", "read-64k"])
+def read_size(request, monkeypatch):
+    # Tiny reads split items, strings and numbers at every possible position
+    monkeypatch.setattr(importer, "READ_SIZE", request.param)
+    return request.param
+
+def test_items_survive_any_read_boundary(read_size):
+    items = [{"label": "a", "points": POINTS}, 12345.678e-3, "sép \\\"]", [1, [2, {}]], None, -0.5]
+    # utf-8-sig: a leading byte order mark is skipped
+    text = "\ufeff [ " + " ,\n\t".join(json.dumps(item, ensure_ascii=False) for item in items) + " ] \n"
+    assert parse(text) == items
+
+@pytest.mark.parametrize("text", ["[]", " [ ] ", "\n[\n]\n"])
+def test_empty_list(text, read_size):
+    assert parse(text) == []
+
+@pytest.mark.parametrize("text", [
+    "",
+    "{}",
+    '{"label": "a"}',
+    "[1, 2",
+    "[1 2]",
+    "[1,, 2]",
+    '[{"label": "a"]',
+    '[{"label": "a", "points": [}]',
+    "[1] trailing",
+    "[1]]",
+    '["unterminated]',
+])
+def test_malformed_documents_raise(text, read_size):
+    with pytest.raises(ValueError):
+        parse(text)
+
+def test_items_before_an_error_are_yielded():
+    items = iter_json_array(io.BytesIO(b'[1, 2, oops]'))
+    assert next(items) == 1
+    assert next(items) == 2
+    with pytest.raises(ValueError):
+        next(items)
+
+def test_oversized_item_raises(monkeypatch):
+    monkeypatch.setattr(importer, "READ_SIZE", 16)
+    monkeypatch.setattr(importer, "MAX_ITEM_CHARS", 64)
+    with pytest.raises(ValueError):
+        parse('["' + "x" * 1000)
+
+def test_validate_item():
+    label, arr = validate_item({"label": "a", "points": POINTS})
+    assert label == "a"
+    assert arr.shape == (2, 3)
+    packed = base64.b64encode(encode_points(POINTS)).decode("ascii")
+    _, packed_arr = validate_item({"label": "a", "points": packed})
+    np.testing.assert_allclose(packed_arr, arr, rtol=1e-6)
+
+@pytest.mark.parametrize("item", [
+    [],
+    {"points": POINTS},
+    {"label": "", "points": POINTS},
+    {"label": 3, "points": POINTS},
+    {"label": "a"},
+    {"label": "a", "points": []},
+    {"label": "a", "points": [{"x": 1, "y": 2}]},
+    {"label": "a", "points": [{"x": "one", "y": 2, "t": 0}]},
+    {"label": "a", "points": [{"x": float("nan"), "y": 2, "t": 0}]},
+    {"label": "a", "points": "not base64!"},
+    {"label": "a", "points": base64.b64encode(b"\x01\x02").decode("ascii")},
+])
+def test_validate_item_rejects(item):
+    with pytest.raises(ValueError):
+        validate_item(item)
+
+def test_run_skips_invalid_items(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(importer, "CHUNK_SIZE", 2)
+    db = Database()
+    db.init_db()
+    items = [{"label": "a", "points": POINTS}, {"label": "b"}, {"label": "a", "points": POINTS},
+             "junk", {"label": "c", "points": POINTS}]
+    with db.session_scope() as session:
+        status = ImportManager().run(io.BytesIO(json.dumps(items).encode()), session)
+    assert status["state"] == "succeeded"
+    assert status["imported"] == 3
+    assert status["skipped"] == 2
+    assert [e["index"] for e in status["errors"]] == [1, 3]
+    with db.session_scope() as session:
+        assert sorted(r.label for r in session.query(Drawing.label)) == ["a", "a", "c"]